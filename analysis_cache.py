@@ -0,0 +1,161 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(value):
+    """캐시 키용 정규화 (유니코드 NFC, 공백 정리)"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFC', str(value))
+    return re.sub(r'\s+', ' ', value).strip()
+
+
+class AnalysisCache:
+    """AI 분석 결과 디스크 캐시
+
+    발신자/제목/내용을 정규화한 값과 프롬프트 버전의 해시를 키로 사용하므로,
+    여러 선생님께 같은 공지가 오거나 같은 내용이 다시 와도 AI를 다시 호출하지
+    않습니다. 최근 항목은 메모리에도 두어 바로 반환하고, 오래된 항목은
+    TTL과 최대 개수 기준으로 지웁니다.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS analysis_cache (
+        cache_key TEXT PRIMARY KEY,
+        analysis TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used
+        ON analysis_cache (last_used);
+    """
+
+    EVICT_EVERY = 100  # 저장 N번마다 정리
+
+    def __init__(self, path='analysis_cache.db', prompt_version=1,
+                 ttl_seconds=30 * 24 * 3600, max_entries=5000, memory_entries=256):
+        self.path = path
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._touched = {}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+        self.evict()
+
+    def make_key(self, sender, title, content):
+        """정규화한 발신자/제목/내용 + 프롬프트 버전의 SHA-256"""
+        raw = '\x1f'.join([
+            str(self.prompt_version),
+            normalize_text(sender),
+            normalize_text(title),
+            normalize_text(content),
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _remember(self, cache_key, analysis_json, created_at):
+        self._memory[cache_key] = (analysis_json, created_at)
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, sender, title, content):
+        """캐시된 분석 결과 반환 (없거나 만료되었으면 None)"""
+        cache_key = self.make_key(sender, title, content)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT analysis, created_at FROM analysis_cache WHERE cache_key = ?",
+                    (cache_key,)).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._remember(cache_key, *entry)
+            if entry is None or now - entry[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._memory.move_to_end(cache_key)
+            # 사용 시각은 모아 두었다가 정리할 때 한 번에 기록 (적중 시 디스크 쓰기 없음)
+            self._touched[cache_key] = now
+            self.hits += 1
+        # 호출한 쪽에서 수정해도 캐시가 바뀌지 않도록 매번 새 dict로 반환
+        return json.loads(entry[0])
+
+    def put(self, sender, title, content, analysis):
+        """분석 결과 저장"""
+        cache_key = self.make_key(sender, title, content)
+        analysis_json = json.dumps(analysis, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache "
+                    "(cache_key, analysis, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (cache_key, analysis_json, now, now))
+            self._remember(cache_key, analysis_json, now)
+            self._puts += 1
+            should_evict = self._puts % self.EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """만료된 항목과 최대 개수를 넘는 오래된 항목 삭제"""
+        with self._lock:
+            with self._conn:
+                self._flush_touched()
+                expired = self._conn.execute(
+                    "DELETE FROM analysis_cache WHERE created_at < ?",
+                    (time.time() - self.ttl_seconds,)).rowcount
+                overflow = self._conn.execute("""
+                    DELETE FROM analysis_cache WHERE cache_key IN (
+                        SELECT cache_key FROM analysis_cache
+                        ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,)).rowcount
+            self.evictions += expired + overflow
+            if expired + overflow:
+                self._memory.clear()
+        return expired + overflow
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE analysis_cache SET last_used = ? WHERE cache_key = ?",
+                [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def stats(self):
+        """적중/실패/삭제 횟수"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        """사용 시각을 기록하고 연결 닫기"""
+        with self._lock:
+            with self._conn:
+                self._flush_touched()
+            self._conn.close()
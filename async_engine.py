@@ -0,0 +1,216 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from openai import AsyncOpenAI
+from scheduler import AdaptivePollPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def _advance(step, value):
+    """제너레이터 한 단계 실행 → (끝났는지, yield한 값 또는 반환값)
+
+    StopIteration은 Future로 전달할 수 없으므로 값으로 바꿔 돌려줍니다.
+    """
+    try:
+        return False, step(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+class AsyncEngine:
+    """asyncio 기반 실행 엔진
+
+    이벤트 루프 하나가 watchdog 알림, 주기 확인, 트레이 명령을 모두 큐로 받아
+    처리합니다. OpenAI 호출은 AsyncOpenAI로 보내므로 여러 분석 요청이 스레드를
+    막지 않고 동시에 진행됩니다. Google 전송은 스레드 엔진과 같이 MessageKey
+    순서대로 모은 묶음을 Google 배치 요청 한 번으로 보내며, 이 동기 호출은
+    스레드에서 실행합니다.
+    """
+
+    def __init__(self, processor, openai_api_key, policy=None, workers=4, debounce=0.5):
+        self.processor = processor
+        self.openai_client = AsyncOpenAI(api_key=openai_api_key)
+        self.policy = policy or AdaptivePollPolicy()
+        self.next_poll = time.monotonic() + self.policy.interval
+        self.workers = workers
+        self.debounce = debounce
+        self.loop = None
+        self.queue = None
+
+    def notify(self, command='process'):
+        """다른 스레드(watchdog, 트레이)에서 이벤트 루프로 명령 전달"""
+        if command == 'watch':
+            self.policy.on_watch_event()
+            command = 'process'
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, command)
+
+    async def run(self):
+        """명령 큐를 처리하는 메인 루프 ('quit' 명령을 받으면 종료)"""
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        timer = asyncio.create_task(self._timer())
+
+        # 기존 메시지 처리 (처음 실행시)
+        self.queue.put_nowait('process')
+        try:
+            while True:
+                command = await self.queue.get()
+                if command == 'quit':
+                    break
+                if command == 'status':
+                    logger.info("CoolMessenger가 백그라운드에서 실행 중입니다.")
+                elif command == 'process':
+                    # 연속된 변경이 잠잠해질 때까지 기다린 뒤, 쌓인 같은 명령은 한 번으로 합침
+                    await asyncio.sleep(self.debounce)
+                    if self._drain_process_commands():
+                        break
+                    processed = await self.process_new_messages()
+                    self.next_poll = time.monotonic() + self.policy.on_pass(
+                        processed > 0, self.processor.reader.file_signature())
+        finally:
+            timer.cancel()
+            await self.openai_client.close()
+
+    def _drain_process_commands(self):
+        """큐에 쌓인 'process' 명령 제거 ('quit'이 있으면 True)"""
+        quit_requested = False
+        while not self.queue.empty():
+            command = self.queue.get_nowait()
+            if command == 'quit':
+                quit_requested = True
+            elif command != 'process':
+                self.queue.put_nowait(command)
+                break
+        return quit_requested
+
+    async def _timer(self):
+        """파일 감지 실패 대비 주기적 확인 (간격은 AdaptivePollPolicy가 결정)"""
+        while True:
+            await asyncio.sleep(max(0.0, min(self.next_poll - time.monotonic(), 1.0)))
+            if time.monotonic() >= self.next_poll:
+                # 처리가 끝나면 다시 정해지므로 그 전까지는 한 번만 요청
+                self.next_poll = float('inf')
+                self.queue.put_nowait('process')
+
+    async def process_new_messages(self):
+        """새로운 메시지들 처리 (분석은 동시에, 전송은 MessageKey 순서대로, 처리한 수 반환)
+
+        조회/상태 기록처럼 막히는 작업은 스레드에서 실행하고, 분석은 스레드 엔진과
+        같은 프로세서 흐름(analysis_steps)을, 전송은 같은 dispatch_items를 씁니다.
+        """
+        processor = self.processor
+        metrics = processor.metrics
+        if not await asyncio.to_thread(processor.has_new_messages):
+            return 0
+
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.workers)
+        batch_size = processor.pipeline.batch_size
+        dispatch_batch_size = processor.pipeline.dispatch_batch_size
+        max_in_flight = self.workers * 2 * batch_size
+        messages = processor.get_new_messages()
+        in_flight = deque()
+        ready = []
+        group = []
+        processed = 0
+        while True:
+            item = await asyncio.to_thread(self._next_item, messages)
+            if item is not None:
+                group.append(item)
+                if len(group) < batch_size:
+                    continue
+            if group:
+                task = asyncio.create_task(self._analyze_group(group, semaphore))
+                in_flight.extend((item, task) for item in group)
+                metrics.set_gauge('analysis', len(in_flight))
+                group = []
+            if item is None:
+                break
+
+            # 앞쪽부터 완료된 것만 순서대로 모았다가 dispatch_batch_size개가 되면 전송
+            while in_flight and (in_flight[0][1].done() or len(in_flight) >= max_in_flight):
+                processed += await self._collect_next(in_flight, ready, dispatch_batch_size)
+
+        while in_flight:
+            processed += await self._collect_next(in_flight, ready, dispatch_batch_size)
+        processed += await self._dispatch(ready)
+        processor.checkpoint_scanned()
+        await asyncio.to_thread(processor.state.flush)
+        metrics.observe('pass', time.monotonic() - started)
+        return processed
+
+    def _next_item(self, messages):
+        """다음 처리 항목 (내용 없는 메시지는 건너뜀, 끝이면 None, 스레드에서 실행)"""
+        for message in messages:
+            item = self.processor.prepare_message(message)
+            if item is not None:
+                return item
+        return None
+
+    async def run_steps(self, steps, perform):
+        """pipeline.run_steps의 asyncio 버전
+
+        흐름의 각 단계(상태 DB, 캐시, 중복 색인처럼 막히는 작업)는 스레드에서
+        실행하고, 요청(perform 코루틴)만 이벤트 루프에서 기다립니다.
+        """
+        done, value = await asyncio.to_thread(_advance, steps.send, None)
+        while not done:
+            try:
+                response = await perform(value)
+            except Exception as e:
+                done, value = await asyncio.to_thread(_advance, steps.throw, e)
+            else:
+                done, value = await asyncio.to_thread(_advance, steps.send, response)
+        return value
+
+    async def _analyze_group(self, group, semaphore):
+        """항목들을 분석해 {MessageKey: 분석 결과} 반환 (analyze_items의 asyncio 버전)"""
+        processor = self.processor
+        async with semaphore:
+            with processor.metrics.timer('analyze'):
+                return await self.run_steps(processor.analysis_steps(group), self._send_openai_request)
+
+    async def _send_openai_request(self, operation):
+        """send_openai_request의 asyncio 버전"""
+        request, tokens = operation
+        metrics = self.processor.metrics
+        with metrics.timer('rate_limit'):
+            await self.processor.rate_limiter.acquire_async(tokens)
+        with metrics.timer('openai'):
+            return await self.openai_client.chat.completions.create(**request)
+
+    async def _collect_next(self, in_flight, ready, dispatch_batch_size):
+        """맨 앞 항목의 분석 결과를 전송 대기 목록에 추가 (MessagePipeline._collect_next의 asyncio 버전)"""
+        metrics = self.processor.metrics
+        processed = 0
+        if not in_flight[0][1].done():
+            # 앞 항목 분석을 기다리는 동안 모아 둔 항목이 머물지 않도록 먼저 전송
+            processed += await self._dispatch(ready)
+        item, task = in_flight.popleft()
+        metrics.set_gauge('analysis', len(in_flight))
+        try:
+            analysis = (await task).get(item['message_key'])
+        except Exception as e:
+            logger.error(f"❌ 메시지 분석 중 오류: {e}")
+            analysis = None
+        ready.append((item, analysis))
+        metrics.set_gauge('dispatch', len(ready))
+        if len(ready) >= dispatch_batch_size:
+            processed += await self._dispatch(ready)
+        return processed
+
+    async def _dispatch(self, ready):
+        """전송 대기 중인 항목을 스레드에서 한 번에 전송 (Google 배치 요청, 상태는 묶음마다 커밋)"""
+        if not ready:
+            return 0
+        count = len(ready)
+        metrics = self.processor.metrics
+        with metrics.timer('dispatch'):
+            await asyncio.to_thread(self.processor.dispatch_items, list(ready))
+        ready.clear()
+        metrics.set_gauge('dispatch', 0)
+        return count
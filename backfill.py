@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import logging
+from state_store import ProcessingStateStore
+
+logger = logging.getLogger(__name__)
+
+
+def parse_bound(value):
+    """FROM/TO 값을 MessageKey(int) 또는 'YYYY-MM-DD' 문자열로 변환"""
+    from date_index import normalize_day
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    day = normalize_day(value)
+    if day is None:
+        raise ValueError(f"MessageKey 또는 YYYY-MM-DD 형식이 아닙니다: {value}")
+    return day
+
+
+def resolve_range(processor, start, end):
+    """FROM/TO를 (after_key, until_key)로 변환 (FROM은 포함, after_key는 FROM 바로 앞 키)"""
+    start, end = parse_bound(start), parse_bound(end)
+    if isinstance(start, str) or isinstance(end, str):
+        processor.date_index.refresh()
+
+    if isinstance(start, int):
+        after_key = start - 1
+    else:
+        first_key = processor.date_index.first_key_on_or_after(start)
+        after_key = (first_key - 1) if first_key is not None else processor.reader.fetch_max_key() or 0
+
+    if isinstance(end, int):
+        until_key = end
+    else:
+        until_key = processor.date_index.last_key_on_or_before(end) or 0
+    return after_key, until_key
+
+
+class BackfillProgress:
+    """백필 진행 상황 파일 (같은 범위/모드로 다시 실행하면 이어서 처리)
+
+    실행 중인 프로그램의 체크포인트(상태 DB)와 별개로 저장하며, 임시 파일에
+    쓴 뒤 교체하므로 중간에 종료되어도 파일이 깨지지 않습니다. dry-run은
+    last_key까지 기록한 결과 파일 크기(output_offset)도 함께 저장합니다.
+    """
+
+    def __init__(self, path, spec):
+        self.path = path
+        self.spec = spec
+        self.after_key = None
+        self.until_key = None
+        self.last_key = None
+        self.processed = 0
+        self.output_offset = None
+        self.completed = False
+
+    def load(self):
+        """같은 범위/모드의 진행 상황이 있으면 읽고 True"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 백필 진행 파일을 읽을 수 없어 처음부터 시작합니다: {e}")
+            return False
+        if data.get('spec') != self.spec:
+            return False
+        self.after_key = data['after_key']
+        self.until_key = data['until_key']
+        self.last_key = data.get('last_key')
+        self.processed = data.get('processed', 0)
+        self.output_offset = data.get('output_offset')
+        self.completed = data.get('completed', False)
+        return True
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'spec': self.spec,
+                'after_key': self.after_key,
+                'until_key': self.until_key,
+                'last_key': self.last_key,
+                'processed': self.processed,
+                'output_offset': self.output_offset,
+                'completed': self.completed,
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class Backfill:
+    """지난 메시지 범위를 다시 분석 (dry-run은 JSONL 파일로, commit은 Google에 추가)
+
+    MessagePipeline으로 분석을 작업자 풀에 나눠 맡기고, 결과는 MessageKey 순서대로
+    기록합니다. 실행 중인 프로그램의 체크포인트는 건드리지 않습니다. dry-run은 상태
+    DB에 아무것도 쓰지 않고, commit은 메시지별 상태만 기록해 실시간 처리가 같은
+    메시지를 다시 추가하지 않게 합니다 (중복 추가 색인도 함께 사용).
+    """
+
+    def __init__(self, processor, after_key, until_key, output_path=None, commit=False,
+                 progress=None, workers=4, batch_size=1, dispatch_batch_size=10, report_every=10):
+        from pipeline import MessagePipeline
+        self.processor = processor
+        self.metrics = processor.metrics
+        self.after_key = after_key
+        self.until_key = until_key
+        self.output_path = output_path
+        self.commit = commit
+        self.progress = progress
+        self.report_every = report_every
+        self.pipeline = MessagePipeline(self, workers=workers, batch_size=batch_size,
+                                        dispatch_batch_size=dispatch_batch_size)
+        self.total = 0
+        self.processed = 0
+        self.dispatched = 0
+        self.failed = 0
+        self._output = None
+        self._started = None
+        self._last_report = 0.0
+
+    def run(self, resume_key=None):
+        """범위를 처리하고 이번 실행에서 처리한 메시지 수 반환 (resume_key 이후부터 이어서)"""
+        start_key = self.after_key if resume_key is None else max(self.after_key, resume_key)
+        self.total = self.processor.reader.count_messages(start_key, self.until_key)
+        if not self.commit:
+            # 이어서 처리할 때는 기존 결과 뒤에 붙임
+            self._output = open(self.output_path, 'a' if resume_key is not None else 'w', encoding='utf-8')
+            if resume_key is not None:
+                self._truncate_output()
+
+        mode = "commit" if self.commit else f"dry-run → {self.output_path}"
+        logger.info(f"🔁 백필 시작: MessageKey {start_key + 1}~{self.until_key} ({self.total:,}개, {mode})")
+        self._started = self._last_report = time.monotonic()
+        try:
+            self.pipeline.run(self.processor.get_messages_between(start_key, self.until_key))
+        finally:
+            if self._output is not None:
+                self._output.close()
+            self.processor.state.flush()
+
+        if self.progress is not None:
+            self.progress.completed = True
+            self.progress.save()
+        elapsed = time.monotonic() - self._started
+        logger.info(f"✅ 백필 완료: {self.processed:,}개 ({elapsed:.0f}초"
+                    + (f", 추가 {self.dispatched:,}개 / 실패 {self.failed:,}개)" if self.commit else ")"))
+        return self.processed
+
+    # MessagePipeline이 호출하는 단계
+    def prepare_message(self, message):
+        return self.processor.prepare_message(message)
+
+    def analyze_items(self, items):
+        # 상태 DB에 fetched를 기록하지 않도록 track_state=False
+        return self.processor.analyze_items(items, track_state=False)
+
+    def dispatch_items(self, pairs):
+        """결과 기록 단계: MessageKey 순서대로 JSONL에 쓰거나 Google에 추가한 뒤 진행 상황 저장"""
+        if self.commit:
+            self._commit(pairs)
+        else:
+            for item, analysis in pairs:
+                self._output.write(json.dumps({
+                    'message_key': item['message_key'],
+                    'receive_date': item['receive_date'],
+                    'sender': item['sender'],
+                    'title': item['title'],
+                    'analysis': analysis,
+                }, ensure_ascii=False) + '\n')
+            self._output.flush()
+
+        self.processed += len(pairs)
+        if self.progress is not None:
+            if self._output is not None:
+                self.progress.output_offset = os.fstat(self._output.fileno()).st_size
+            self.progress.last_key = pairs[-1][0]['message_key']
+            self.progress.processed += len(pairs)
+            self.progress.save()
+        self.metrics.processed(len(pairs))
+        self._report()
+
+    def _truncate_output(self):
+        """진행 상황을 저장하기 전에 종료되어 다시 처리할 묶음의 결과를 잘라냄 (중복 줄 방지)"""
+        offset = self.progress.output_offset if self.progress is not None else None
+        if offset is None:
+            return
+        size = os.fstat(self._output.fileno()).st_size
+        if size > offset:
+            logger.info(f"✂️ 마지막 진행 상황 이후에 기록된 결과 {size - offset:,}바이트를 지우고 다시 처리합니다")
+            self._output.truncate(offset)
+
+    def _commit(self, pairs):
+        processor = self.processor
+        valid = [(item, analysis) for item, analysis in pairs
+                 if isinstance(analysis, dict) and analysis and not processor.is_done(item)]
+        results = processor.send_analyses_batch(valid) if valid else {}
+        for item, analysis in valid:
+            dispatched = results.get(item['message_key'], False)
+            status = ProcessingStateStore.DISPATCHED if dispatched else ProcessingStateStore.FAILED
+            processor.state.mark(item['message_key'], status, analysis=analysis)
+            if dispatched:
+                self.dispatched += 1
+            else:
+                self.failed += 1
+        processor.state.flush()
+
+    def _report(self):
+        now = time.monotonic()
+        if now - self._last_report < self.report_every:
+            return
+        self._last_report = now
+        elapsed = now - self._started
+        rate = self.processed / elapsed if elapsed else 0.0
+        percent = self.processed / self.total * 100 if self.total else 100.0
+        remaining = (self.total - self.processed) / rate if rate else 0.0
+        logger.info(f"🔄 백필 진행: {self.processed:,}/{self.total:,} ({percent:.1f}%), "
+                    f"{rate:.1f}개/초, 남은 시간 약 {remaining / 60:.0f}분")
+
+
+def run_backfill(db_path, openai_api_key, start, end, commit=False, output_path='backfill.jsonl',
+                 progress_path='backfill_progress.json', restart=False):
+    """--backfill FROM TO 실행"""
+    from coolmessenger_auto import CoolMessengerProcessor
+
+    # 예전 체크포인트 파일을 옮기지 않도록 legacy_checkpoint_file=None
+    processor = CoolMessengerProcessor(db_path, openai_api_key, legacy_checkpoint_file=None)
+    try:
+        spec = {'from': str(start), 'to': str(end), 'commit': commit,
+                'output': None if commit else os.path.abspath(output_path)}
+        progress = BackfillProgress(progress_path, spec)
+        resume_key = None
+        if not restart and progress.load():
+            if progress.completed:
+                logger.info(f"✅ 이미 완료된 백필입니다 ({progress.processed:,}개). 다시 하려면 --restart를 주세요")
+                return 0
+            resume_key = progress.last_key
+            if resume_key is not None:
+                logger.info(f"⏩ 이전 진행 상황에서 이어서 처리합니다 (MessageKey {resume_key} 이후)")
+        else:
+            try:
+                progress.after_key, progress.until_key = resolve_range(processor, start, end)
+            except ValueError as e:
+                logger.error(f"❌ {e}")
+                return 0
+            progress.save()
+
+        if progress.until_key <= progress.after_key:
+            logger.warning("⚠️ 백필 범위에 메시지가 없습니다")
+            return 0
+
+        backfill = Backfill(
+            processor, progress.after_key, progress.until_key,
+            output_path=output_path, commit=commit, progress=progress,
+            workers=int(os.getenv('BACKFILL_WORKERS', os.getenv('ANALYSIS_WORKERS', '4'))),
+            batch_size=int(os.getenv('ANALYSIS_BATCH_SIZE', '1')),
+            dispatch_batch_size=int(os.getenv('DISPATCH_BATCH_SIZE', '10'))
+        )
+        return backfill.run(resume_key)
+    finally:
+        processor.log_router_stats()
+        processor.close()
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CoolMessenger 처리 성능 측정 도구
+가짜 tbl_recv 데이터베이스와 로컬 가짜 OpenAI/Google 서버로 조회 → 분석 → 전송
+전체 경로를 네트워크 없이 실행해 처리량, 메시지별 지연, 최대 메모리, 시작 시간을 잽니다
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import date, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_START_DATE = date(2025, 3, 3)
+BENCH_API_KEY = 'sk-benchmark'
+
+# 가짜 메시지 재료 (학교 메신저에서 자주 오는 형태)
+SENDERS = ['교무부', '행정실', '3학년부', '정보부', '교감', '교장', '학생부', '진로상담부']
+EVENTS = ['교직원 회의', '학년 협의회', '학부모 상담', '체육대회 리허설', '방과후 설명회', '연수', '학교운영위원회']
+PLACES = ['본관 3층 회의실', '시청각실', '도서관', '체육관', '교무실']
+DOCUMENTS = ['수행평가 계획서', '출결 확인서', '연수 이수증', '동아리 활동 보고서', '학부모 동의서']
+TOPICS = ['급식 메뉴 변경', '주차장 공사', '복사기 점검', '정수기 교체', '방역 소독']
+WEEKDAYS = '월화수목금토일'
+
+# 메시지 종류별 비율 (일정, 할일, 공지, 전달/회신 이력이 붙은 긴 메시지, 같은 공지 반복)
+# llm: 로컬 분류기 없이(LOCAL_CLASSIFIER=off) 대부분 AI가 판단해야 하는 애매한 메시지
+MESSAGE_MIXES = {
+    'default': [('calendar', 35), ('todo', 25), ('info', 20), ('forwarded', 10), ('repeat', 10)],
+    'llm': [('ambiguous', 50), ('calendar', 15), ('todo', 15), ('forwarded', 20)],
+}
+
+
+def make_message(rng, kind, day):
+    """(제목, 본문, 발신자) 생성"""
+    sender = rng.choice(SENDERS)
+    target = day + timedelta(days=rng.randint(1, 14))
+    when = f"{target.month}월 {target.day}일({WEEKDAYS[target.weekday()]})"
+    if kind == 'calendar':
+        event = rng.choice(EVENTS)
+        title = f"{when} {event} 안내"
+        body = (f"안녕하세요, {sender}입니다.\n{when} 오후 {rng.randint(1, 5)}시에 "
+                f"{rng.choice(PLACES)}에서 {event}가 있습니다.\n참석 부탁드립니다.")
+    elif kind == 'todo':
+        document = rng.choice(DOCUMENTS)
+        title = f"{document} 제출 요청"
+        body = f"선생님들께서는 {document}를 {when}까지 제출해 주시기 바랍니다.\n감사합니다."
+    elif kind == 'forwarded':
+        event = rng.choice(EVENTS)
+        title = f"FW: {event} 자료"
+        quoted = '\n'.join([f"> {event} 관련 자료를 보내드립니다."] * 5)
+        history = (f"-----Original Message-----\n보낸 사람: {rng.choice(SENDERS)}\n"
+                   f"받는 사람: 전체 교직원\n제목: {event}\n\n{quoted}\n")
+        body = f"<p>아래 메일 참고 부탁드립니다.</p><br><div>{when} 오전 10시 {event}</div>\n" + history * 3
+    elif kind == 'ambiguous':
+        # 날짜가 상대적이거나 없고, 할 일인지 일정인지 문맥으로만 알 수 있는 메시지
+        event = rng.choice(EVENTS)
+        document = rng.choice(DOCUMENTS)
+        title, body = rng.choice([
+            (f"{event} 일정 조율", f"다음 주 중에 {event} 일정을 잡으려고 합니다.\n가능한 시간 알려주세요."),
+            (f"{document} 관련", f"지난번 말씀드린 {document} 건, 확인하시고 제출 부탁드립니다."),
+            (f"내일 {event}", f"내일 오후에 {rng.choice(PLACES)}에서 잠깐 {event} 이야기 나눌 수 있을까요?"),
+            ("Re: 문의 드린 건", "네 알겠습니다. 그럼 그때 뵙겠습니다."),
+        ])
+    elif kind == 'repeat':
+        title = "[공지] 교내 와이파이 점검"
+        body = "이번 주 방과후 시간에 교내 와이파이 점검이 있습니다. 업무에 참고해 주세요."
+    else:
+        topic = rng.choice(TOPICS)
+        title = f"{topic} 안내"
+        body = f"{topic} 관련하여 안내드립니다. 자세한 내용은 첨부 파일을 확인해 주세요."
+    return title, body, sender
+
+
+def generate_udb(path, rows, seed=42, mix='default'):
+    """가짜 tbl_recv 데이터베이스 생성 (하루에 100개씩, 1%는 삭제된 메시지)"""
+    rng = random.Random(seed)
+    kinds = [kind for kind, weight in MESSAGE_MIXES[mix] for _ in range(weight)]
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("""
+    CREATE TABLE tbl_recv (
+        MessageKey INTEGER PRIMARY KEY, MessageBody TEXT, Title TEXT, Sender TEXT, SenderKey TEXT,
+        MessageType INTEGER, ReceiveDate TEXT, MessageText TEXT, MemoID TEXT,
+        ReferenceList TEXT, CCList TEXT, FilePath TEXT, IsUnRead INTEGER, DeletedDate TEXT
+    )""")
+    batch = []
+    for key in range(1, rows + 1):
+        day = BENCH_START_DATE + timedelta(days=(key - 1) // 100)
+        title, body, sender = make_message(rng, rng.choice(kinds), day)
+        received = f"{day.isoformat()} {8 + key % 9:02d}:{key % 60:02d}:00"
+        deleted = received if rng.random() < 0.01 else None
+        file_path = f"C:\\CoolMessenger\\files\\{key}.hwp" if rng.random() < 0.05 else None
+        batch.append((key, body, title, sender, f"u{SENDERS.index(sender)}", 1, received,
+                      None, f"m{key}", '', '', file_path, 1, deleted))
+        if len(batch) >= 10000:
+            conn.executemany("INSERT INTO tbl_recv VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO tbl_recv VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def fake_analysis(text):
+    """메시지 내용으로 그럴듯한 분석 결과 생성 (구조화된 출력 스키마 형식)"""
+    date_match = re.search(r'(\d{1,2})월 (\d{1,2})일', text)
+    time_match = re.search(r'(오전|오후) (\d{1,2})시', text)
+    title_match = re.search(r'제목: (.*)', text)
+    day = f"2025-{int(date_match.group(1)):02d}-{int(date_match.group(2)):02d}" if date_match else None
+    hour = None
+    if time_match:
+        hour = int(time_match.group(2)) + (12 if time_match.group(1) == '오후' else 0)
+    kind = 'todo' if '제출' in text else 'calendar' if day else 'info'
+    return {
+        "type": kind,
+        "priority": "medium",
+        "title": (title_match.group(1).strip() if title_match else "메시지")[:50],
+        "description": text.strip()[:100],
+        "date": day if kind == 'calendar' else None,
+        "time": f"{hour:02d}:00" if hour is not None and kind == 'calendar' else None,
+        "deadline": day if kind == 'todo' else None,
+        "category": "회의" if '회의' in text else "기타",
+        "confidence": 0.95 if day or kind == 'info' else 0.6,
+    }
+
+
+class FakeAPIServer:
+    """가짜 OpenAI(/v1/chat/completions)와 Google Calendar/Tasks(일반/배치 요청) 서버
+
+    latency초(+ 0~jitter초) 늦게 응답하고, error_rate 비율로 503 오류를 돌려줍니다.
+    """
+
+    def __init__(self, openai_latency=0.05, google_latency=0.02, jitter=0.0, error_rate=0.0, seed=7):
+        self.openai_latency = openai_latency
+        self.google_latency = google_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.counts = {'openai': 0, 'google': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def root_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    def _delay(self, latency):
+        with self._lock:
+            wait = latency + self.rng.uniform(0, self.jitter)
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.counts['errors'] += 1
+        time.sleep(wait)
+        return fail
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def chat_completion(self, request):
+        """chat.completions 응답 (묶음 요청이면 analyses 배열)"""
+        prompt = request['messages'][-1]['content']
+        section = prompt.split('분류 우선순위')[0]  # 규칙 예시의 날짜는 제외
+        schema_name = request.get('response_format', {}).get('json_schema', {}).get('name')
+        if schema_name == 'message_analyses':
+            parts = re.split(r'\[메시지 (\d+)\]', section)
+            content = {"analyses": [dict(fake_analysis(text), message_key=int(key))
+                                    for key, text in zip(parts[1::2], parts[2::2])]}
+        else:
+            content = fake_analysis(section)
+        text = json.dumps(content, ensure_ascii=False)
+        return {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request['model'],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text, "refusal": None}}],
+            "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(text) // 2,
+                      "total_tokens": (len(prompt) + len(text)) // 2},
+        }
+
+    def batch_response(self, content_type, body):
+        """Google 배치 요청(multipart/mixed)에 하위 요청별 응답 생성"""
+        message = BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body)
+        boundary = 'benchmark_batch_boundary'
+        parts = []
+        for part in message.get_payload():
+            content_id = part['Content-ID'][1:-1]
+            if self.rng.random() < self.error_rate:
+                self._count('errors')
+                status, payload = '503 Service Unavailable', {"error": {"code": 503}}
+            else:
+                status, payload = '200 OK', {"id": f"bench-{self.rng.getrandbits(48):x}"}
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n")
+        self._count('google', len(parts))
+        return f"multipart/mixed; boundary={boundary}", (''.join(parts) + f"--{boundary}--\r\n").encode('utf-8')
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, status, payload):
+                self._reply(status, 'application/json', json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+            def _handle(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                path = self.path.split('?', 1)[0]
+                if path.endswith('/chat/completions'):
+                    server._count('openai')
+                    if server._delay(server.openai_latency):
+                        self._json(503, {"error": {"message": "injected error", "type": "server_error"}})
+                        return
+                    self._json(200, server.chat_completion(json.loads(body)))
+                elif path == '/batch' or path.startswith('/batch/'):
+                    time.sleep(server.google_latency)
+                    content_type, payload = server.batch_response(self.headers['Content-Type'], body)
+                    self._reply(200, content_type, payload)
+                elif path.startswith(('/calendar/', '/tasks/')):
+                    server._count('google')
+                    if server._delay(server.google_latency):
+                        self._json(503, {"error": {"code": 503, "message": "injected error"}})
+                        return
+                    self._json(200, {"id": f"bench-{server.rng.getrandbits(48):x}"})
+                else:
+                    self._json(404, {"error": {"code": 404}})
+
+            do_POST = _handle
+            do_PATCH = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def build_fake_google_service(name, root_url):
+    """rootUrl을 가짜 서버로 바꾼 디스커버리 문서로 Google API 서비스 생성 (인증 없음)"""
+    import httplib2
+    import googleapiclient
+    from googleapiclient.discovery import build_from_document
+    from coolmessenger_auto import GOOGLE_API_VERSIONS
+    document_path = os.path.join(os.path.dirname(googleapiclient.__file__), 'discovery_cache',
+                                 'documents', f'{name}.{GOOGLE_API_VERSIONS[name]}.json')
+    with open(document_path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    document['rootUrl'] = root_url
+    document['baseUrl'] = root_url + document['servicePath']
+    return build_from_document(document, http=httplib2.Http())
+
+
+def peak_rss_mb():
+    """현재 프로세스의 최대 메모리 사용량 (MB, 알 수 없으면 None)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux는 KB, macOS는 바이트 단위
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def percentile(values, q):
+    """정렬된 값의 q 분위수"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_async_engine(processor):
+    """AsyncEngine으로 한 번 처리"""
+    import asyncio
+    from async_engine import AsyncEngine
+    engine = AsyncEngine(processor, BENCH_API_KEY, workers=int(os.getenv('ANALYSIS_WORKERS', '4')))
+
+    async def process():
+        try:
+            return await engine.process_new_messages()
+        finally:
+            await engine.openai_client.close()
+
+    return asyncio.run(process())
+
+
+def run_worker(udb_path, engine, api_root, workdir):
+    """작업 프로세스: 프로세서를 만들어 모든 메시지를 한 번 처리하고 결과를 JSON으로 출력"""
+    import logging
+    started = time.perf_counter()
+    os.chdir(workdir)  # 로그/상태/캐시 파일은 실행마다 새 폴더에
+    from coolmessenger_auto import CoolMessengerProcessor
+    logging.disable(logging.INFO)
+    processor = CoolMessengerProcessor(udb_path, BENCH_API_KEY, start_date=BENCH_START_DATE.isoformat(),
+                                       legacy_checkpoint_file=None)
+    startup = time.perf_counter() - started
+    processor.calendar_service = build_fake_google_service('calendar', api_root)
+    processor.tasks_service = build_fake_google_service('tasks', api_root)
+
+    # 조회부터 전송 완료까지 메시지별 지연 측정
+    fetched_at = {}
+    latencies = []
+    prepare_message = processor.prepare_message
+    finish_dispatch = processor.finish_dispatch
+
+    def timed_prepare(message):
+        item = prepare_message(message)
+        if item is not None:
+            fetched_at[item['message_key']] = time.perf_counter()
+        return item
+
+    def timed_finish(item, analysis, dispatched):
+        finish_dispatch(item, analysis, dispatched)
+        latencies.append(time.perf_counter() - fetched_at.pop(item['message_key']))
+
+    processor.prepare_message = timed_prepare
+    processor.finish_dispatch = timed_finish
+
+    began = time.perf_counter()
+    if engine == 'async':
+        processed = run_async_engine(processor)
+    else:
+        processed = processor.process_new_messages()
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    snapshot = processor.metrics.snapshot()
+    processor.close()
+    print(json.dumps({
+        'processed': processed,
+        'seconds': elapsed,
+        'messages_per_second': processed / elapsed if elapsed else 0.0,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'peak_rss_mb': peak_rss_mb(),
+        'startup_seconds': startup,
+        'errors': snapshot['errors'],
+        'stages': {stage: {'p50': data['p50'], 'p99': data['p99'], 'count': data['count']}
+                   for stage, data in snapshot['stages'].items()},
+    }))
+
+
+def run_scenario(rows, engine, args, server):
+    """작업 프로세스 하나로 시나리오 실행"""
+    suffix = '' if args.mix == 'default' else f'_{args.mix}'
+    udb_path = os.path.join(args.data_dir, f'bench_{rows}_{args.seed}{suffix}.udb')
+    if not os.path.exists(udb_path):
+        print(f"🛠️ 가짜 데이터베이스 생성 중: {rows:,}행 ({args.mix})")
+        generate_udb(udb_path + '.tmp', rows, args.seed, args.mix)
+        os.replace(udb_path + '.tmp', udb_path)
+
+    env = dict(os.environ,
+               OPENAI_API_KEY=BENCH_API_KEY,
+               OPENAI_BASE_URL=server.root_url + 'v1',
+               OPENAI_RPM=str(args.rpm),
+               OPENAI_TPM=str(args.tpm),
+               PYTHONIOENCODING='utf-8')
+    if args.mix == 'llm':
+        env['LOCAL_CLASSIFIER'] = 'off'
+    script = os.path.abspath(__file__)
+    with tempfile.TemporaryDirectory(prefix='coolmessenger_bench_') as workdir:
+        result = subprocess.run(
+            [sys.executable, script, '--worker', udb_path, '--engine', engine,
+             '--api-root', server.root_url, '--workdir', workdir],
+            cwd=os.path.dirname(script), env=env, capture_output=True, text=True,
+            encoding='utf-8', check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"{rows:,}행 {engine} 실행 실패:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report.update(rows=rows, engine=engine, mix=args.mix)
+    return report
+
+
+def print_report(reports):
+    print(f"\n{'행 수':>10} {'엔진':>7} {'처리':>9} {'msg/s':>9} {'p50(ms)':>9} {'p99(ms)':>9} "
+          f"{'RSS(MB)':>8} {'시작(ms)':>9}")
+    for report in reports:
+        rss = f"{report['peak_rss_mb']:.0f}" if report['peak_rss_mb'] is not None else '-'
+        print(f"{report['rows']:>10,} {report['engine']:>7} {report['processed']:>9,} "
+              f"{report['messages_per_second']:>9.1f} {report['latency_p50'] * 1000:>9.0f} "
+              f"{report['latency_p99'] * 1000:>9.0f} {rss:>8} {report['startup_seconds'] * 1000:>9.0f}")
+        stages = ', '.join(f"{stage} {data['p50'] * 1000:.0f}/{data['p99'] * 1000:.0f}ms"
+                           for stage, data in report['stages'].items())
+        print(f"{'':>10} 메시지 구성 {report['mix']}")
+        print(f"{'':>10} 단계별 p50/p99: {stages}")
+        if report['errors']:
+            print(f"{'':>10} 오류: {report['errors']}")
+
+
+def compare_with_baseline(reports, baseline_path, tolerance):
+    """기준 결과보다 처리량이 줄거나 p99가 늘었으면 False"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['rows'], r['engine'], r.get('mix', 'default')): r for r in json.load(f)}
+    ok = True
+    for report in reports:
+        base = baseline.get((report['rows'], report['engine'], report['mix']))
+        if base is None:
+            continue
+        slower = report['messages_per_second'] < base['messages_per_second'] * (1 - tolerance)
+        later = report['latency_p99'] > base['latency_p99'] * (1 + tolerance)
+        if slower or later:
+            ok = False
+            print(f"❌ {report['rows']:,}행 {report['engine']}: "
+                  f"{base['messages_per_second']:.1f} → {report['messages_per_second']:.1f} msg/s, "
+                  f"p99 {base['latency_p99'] * 1000:.0f} → {report['latency_p99'] * 1000:.0f} ms")
+    if ok:
+        print(f"✅ 기준 결과({baseline_path}) 대비 성능 저하 없음 (허용 {tolerance:.0%})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CoolMessenger 처리 성능 측정')
+    parser.add_argument('--sizes', default='1000,10000',
+                       help='측정할 메시지 수 (쉼표로 구분, 예: 1000,100000,1000000)')
+    parser.add_argument('--engines', default='thread',
+                       help='측정할 실행 엔진 (thread, async 또는 thread,async)')
+    parser.add_argument('--mix', choices=sorted(MESSAGE_MIXES), default='default',
+                       help='메시지 구성 (llm: 로컬 분류기를 끄고 애매한 메시지 위주로 AI 경로 측정)')
+    parser.add_argument('--openai-latency', type=float, default=0.05,
+                       help='가짜 OpenAI 응답 지연 초 (기본값: 0.05)')
+    parser.add_argument('--google-latency', type=float, default=0.02,
+                       help='가짜 Google 응답 지연 초 (기본값: 0.02)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                       help='응답 지연에 더할 무작위 지연 최대 초')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='503 오류를 돌려줄 요청 비율 (0~1)')
+    parser.add_argument('--rpm', type=int, default=1000000, help='OPENAI_RPM (기본값: 사실상 제한 없음)')
+    parser.add_argument('--tpm', type=int, default=1000000000, help='OPENAI_TPM (기본값: 사실상 제한 없음)')
+    parser.add_argument('--seed', type=int, default=42, help='가짜 메시지 생성 시드')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'coolmessenger_bench'),
+                       help='가짜 데이터베이스를 만들어 둘 폴더 (같은 크기는 다시 사용)')
+    parser.add_argument('--save', help='결과를 저장할 JSON 파일')
+    parser.add_argument('--baseline', help='비교할 기준 결과 JSON 파일 (성능이 떨어지면 종료 코드 1)')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                       help='기준 결과 대비 허용 오차 (기본값: 0.2)')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--engine', default='thread', help=argparse.SUPPRESS)
+    parser.add_argument('--api-root', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.engine, args.api_root, args.workdir)
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    server = FakeAPIServer(args.openai_latency, args.google_latency, args.jitter, args.error_rate).start()
+    print(f"🧪 가짜 API 서버: {server.root_url} (OpenAI {args.openai_latency * 1000:.0f}ms, "
+          f"Google {args.google_latency * 1000:.0f}ms, 오류 {args.error_rate:.0%})")
+
+    reports = []
+    try:
+        for rows in [int(size) for size in args.sizes.split(',')]:
+            for engine in args.engines.split(','):
+                print(f"⏱️ {rows:,}행 / {engine} 엔진 측정 중...")
+                reports.append(run_scenario(rows, engine, args, server))
+    finally:
+        server.close()
+
+    print_report(reports)
+    print(f"\n📡 가짜 API 요청: OpenAI {server.counts['openai']:,}회, Google {server.counts['google']:,}건, "
+          f"주입한 오류 {server.counts['errors']:,}회")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"💾 결과 저장: {args.save}")
+
+    if args.baseline and not compare_with_baseline(reports, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,25 @@
-import sqlite3
 import os
 import time
 import json
 from datetime import datetime, timedelta
-import re
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from openai import OpenAI
 import pickle
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 import threading
 import argparse
 from startup_manager import WindowsStartupManager
+from udb_reader import UDBReader
+from state_store import ProcessingStateStore
+from date_index import DateKeyIndex
+from pipeline import MessagePipeline, RateLimiter, estimate_tokens, run_steps
+from analysis_cache import AnalysisCache
+import local_classifier
+from dispatch_index import DispatchIndex, body_hash
+from text_normalizer import MessageNormalizer
+from model_router import ModelRouter
+from metrics import StageMetrics
 from dotenv import load_dotenv
 import logging
-try:
-    from system_tray import SystemTrayApp
-    TRAY_AVAILABLE = True
-except ImportError:
-    TRAY_AVAILABLE = False
-    print("⚠️ 시스템 트레이 기능을 사용하려면 pystray와 Pillow를 설치하세요:")
-    print("pip install pystray Pillow")
+# openai, Google API, watchdog, 시스템 트레이는 무거워서 실제로 필요할 때 가져옴
+# (--setup-startup 같은 간단한 명령은 이 모듈들을 불러오지 않고 바로 끝남)
 
 # 환경 변수 로드
 load_dotenv()
@@ -51,30 +47,259 @@ def setup_logging():
 
 logger = setup_logging()
 
+# 분류 규칙, 응답 필드, 날짜 규칙 (단일/묶음 프롬프트에서 함께 사용)
+ANALYSIS_RULES = """
+        분류 우선순위:
+        1. CALENDAR 우선: 날짜/시간이 언급되거나 특정 시점의 활동이면 무조건 "calendar"
+        2. 회의, 행사, 수업, 활동, 모임, 시간표 관련 = "calendar"
+        3. 마감일이 있는 과제, 제출물 = "calendar" (마감일을 일정으로)
+        4. 단순 확인, 회신, 준비만 필요한 것 = "todo"
+        5. 공지, 안내만 하는 것 = "info"
+"""
+
+ANALYSIS_FIELDS = """
+            "type": "calendar|todo|info",
+            "priority": "high|medium|low",
+            "title": "간단한 제목",
+            "description": "상세 설명",
+            "date": "2025-MM-DD",
+            "time": "HH:MM",
+            "deadline": "2025-MM-DD",
+            "category": "수업|회의|행사|과제|기타",
+            "confidence": 0.0~1.0 (분류를 얼마나 확신하는지)
+"""
+
+ANALYSIS_DATE_RULES = """
+        날짜 추출 규칙 (현재: 2025년 5월 29일 목요일):
+        - "오늘" = 2025-05-29
+        - "내일" = 2025-05-30  
+        - "금요일", "이번 금요일" = 2025-05-30
+        - "다음주 월요일" = 2025-06-02
+        - "6월 3일" = 2025-06-03
+        - 시간: "오후 2시" = 14:00, "9시 30분" = 09:30
+        
+        중요: 시간/날짜가 조금이라도 언급되면 반드시 "calendar"로 분류하세요!
+"""
+
+# 메시지 분석에 사용하는 모델과 시스템 프롬프트
+# 프롬프트나 모델을 바꾸면 PROMPT_VERSION을 올려서 기존 캐시를 무효화하세요
+PROMPT_VERSION = 2
+ANALYSIS_MODEL = os.getenv('ANALYSIS_MODEL', 'gpt-4o')
+# 짧은 메시지를 먼저 보내는 빠른 모델 (비우면 ANALYSIS_MODEL 하나만 사용)
+ANALYSIS_FAST_MODEL = os.getenv('ANALYSIS_FAST_MODEL', 'gpt-4o-mini')
+ANALYSIS_SYSTEM_PROMPT = "당신은 JSON만 반환하는 AI입니다. 학교 일정을 캘린더 중심으로 분류하세요."
+
+# Google API 배치 요청 설정 (배치당 최대 요청 수, 실패한 하위 요청 재시도 횟수)
+GOOGLE_BATCH_LIMIT = 50
+GOOGLE_BATCH_RETRIES = 3
+
+# Google API 서비스 (이름: 버전)
+GOOGLE_API_VERSIONS = {'calendar': 'v3', 'tasks': 'v1'}
+
+def build_google_service(name, credentials):
+    """네트워크 없이 Google API 서비스 생성
+
+    GOOGLE_DISCOVERY_DIR에 '<이름>.<버전>.json' 디스커버리 문서가 있으면 그것을,
+    없으면 google-api-python-client에 포함된 문서를 사용합니다.
+    """
+    from googleapiclient.discovery import build, build_from_document
+    version = GOOGLE_API_VERSIONS[name]
+    discovery_dir = os.getenv('GOOGLE_DISCOVERY_DIR')
+    if discovery_dir:
+        document_path = os.path.join(discovery_dir, f'{name}.{version}.json')
+        if os.path.exists(document_path):
+            with open(document_path, 'r', encoding='utf-8') as f:
+                return build_from_document(f.read(), credentials=credentials)
+    return build(name, version, credentials=credentials,
+                 static_discovery=True, cache_discovery=False)
+
+# 403 중 다시 시도할 만한 이유 (그 외 403은 권한/범위 오류라 재시도해도 실패)
+RETRYABLE_403_REASONS = {'ratelimitexceeded', 'userratelimitexceeded', 'rate_limit_exceeded'}
+
+def google_error_reasons(exception):
+    """Google API 오류 응답 본문의 reason 값들 (소문자)"""
+    try:
+        content = getattr(exception, 'content', b'') or b''
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        error = json.loads(content).get('error', {})
+    except (ValueError, AttributeError):
+        return set()
+    if not isinstance(error, dict):
+        return set()
+    entries = (error.get('errors') or []) + (error.get('details') or [])
+    return {str(entry.get('reason', '')).lower() for entry in entries if isinstance(entry, dict)}
+
+def is_retryable_google_error(exception):
+    """다시 시도할 만한 Google API 오류인지 확인 (요청 한도 초과, 서버 오류)"""
+    status = getattr(getattr(exception, 'resp', None), 'status', None)
+    if status is None:
+        return True
+    status = int(status)
+    if status == 403:
+        return bool(google_error_reasons(exception) & RETRYABLE_403_REASONS)
+    return status in (429, 500, 502, 503, 504)
+
+def create_openai_client(openai_api_key):
+    """OpenAI 클라이언트 생성"""
+    from openai import OpenAI
+    return OpenAI(api_key=openai_api_key)
+
+def create_rate_limiter(shares=1):
+    """OPENAI_RPM/OPENAI_TPM 기준 요청 제한기 (여러 프로세스가 나눠 쓰면 shares로 나눔)"""
+    return RateLimiter(
+        requests_per_minute=max(1, int(os.getenv('OPENAI_RPM', '60')) // shares),
+        tokens_per_minute=max(1, int(os.getenv('OPENAI_TPM', '40000')) // shares)
+    )
+
+def create_analysis_cache():
+    """ANALYSIS_CACHE_* 설정으로 분석 캐시 생성"""
+    return AnalysisCache(
+        os.getenv('ANALYSIS_CACHE_PATH', 'analysis_cache.db'),
+        prompt_version=PROMPT_VERSION,
+        ttl_seconds=int(os.getenv('ANALYSIS_CACHE_TTL_DAYS', '30')) * 24 * 3600,
+        max_entries=int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '5000'))
+    )
+
+def create_metrics_exporter(metrics, shard=None):
+    """METRICS_* 설정으로 지표 내보내기 생성 (shard: 여러 프로세스로 나눴을 때 프로세스 번호)"""
+    from metrics import MetricsExporter
+    port = int(os.getenv('METRICS_PORT') or 0)
+    snapshot_path = os.getenv('METRICS_SNAPSHOT_FILE', 'metrics.json')
+    if shard is not None:
+        # 프로세스마다 포트와 스냅샷 파일을 따로 사용
+        port = port + shard if port else 0
+        if snapshot_path:
+            root, ext = os.path.splitext(snapshot_path)
+            snapshot_path = f"{root}.{shard}{ext}"
+    return MetricsExporter(
+        metrics,
+        port=port or None,
+        host=os.getenv('METRICS_HOST', '127.0.0.1'),
+        snapshot_path=snapshot_path or None,
+        interval=float(os.getenv('METRICS_SNAPSHOT_SECONDS', '30'))
+    )
+
+def create_poll_policy(background=False):
+    """주기 확인 간격: 새 메시지가 오면 짧게, 조용하면 점점 길게 (백그라운드는 더 길게)"""
+    from scheduler import AdaptivePollPolicy
+    return AdaptivePollPolicy(
+        min_interval=float(os.getenv('POLL_MIN_SECONDS', '30' if background else '15')),
+        max_interval=float(os.getenv('POLL_MAX_SECONDS', '1800' if background else '300')),
+        backoff=float(os.getenv('POLL_BACKOFF', '2'))
+    )
+
 class CoolMessengerProcessor:
-    def __init__(self, db_path, openai_api_key):
+    def __init__(self, db_path, openai_api_key, start_date=None, state_db_path=None,
+                 google_credentials_file=None, google_token_file='token.pickle',
+                 legacy_checkpoint_file='last_processed.txt',
+                 openai_client=None, rate_limiter=None, analysis_cache=None, executor=None,
+                 metrics=None):
+        # openai_client/rate_limiter/analysis_cache/executor/metrics를 넘기면 여러 메일함이 함께 사용
         self.db_path = db_path
-        self.openai_client = OpenAI(api_key=openai_api_key)
-        self.calendar_service = None
-        self.tasks_service = None
-        self.last_message_key = self.get_last_message_key()
-        
-        # Google API 설정
-        self.setup_google_apis()
+        self.metrics = metrics or StageMetrics()
+        self.reader = UDBReader(db_path, batch_size=int(os.getenv('FETCH_BATCH_SIZE', '50')))
+        self.openai_client = openai_client or create_openai_client(openai_api_key)
+        self.rate_limiter = rate_limiter or create_rate_limiter()
+        self.owns_analysis_cache = analysis_cache is None
+        self.analysis_cache = analysis_cache or create_analysis_cache()
+        self.local_classifier_enabled = os.getenv('LOCAL_CLASSIFIER', 'on').lower() not in ('off', '0', 'false')
+        self.local_classifier_threshold = float(os.getenv('LOCAL_CLASSIFIER_THRESHOLD', '0.85'))
+        self.batch_max_chars = int(os.getenv('ANALYSIS_BATCH_MAX_CHARS', '2000'))
+        self.normalizer = MessageNormalizer(
+            ANALYSIS_MODEL,
+            max_tokens=int(os.getenv('MESSAGE_TOKEN_BUDGET', '1500')),
+            enabled=os.getenv('MESSAGE_NORMALIZE', 'on').lower() not in ('off', '0', 'false')
+        )
+        self.router = ModelRouter(
+            ANALYSIS_MODEL,
+            fast_model=ANALYSIS_FAST_MODEL,
+            fast_max_tokens=int(os.getenv('ROUTER_FAST_MAX_TOKENS', '400')),
+            escalate_below=float(os.getenv('ROUTER_ESCALATE_BELOW', '0.7')),
+            count_tokens=self.normalizer.tokenizer.count,
+            system_prompt=ANALYSIS_SYSTEM_PROMPT
+        )
+        self.pipeline = MessagePipeline(
+            self,
+            workers=int(os.getenv('ANALYSIS_WORKERS', '4')),
+            batch_size=int(os.getenv('ANALYSIS_BATCH_SIZE', '1')),
+            dispatch_batch_size=int(os.getenv('DISPATCH_BATCH_SIZE', '10')),
+            executor=executor
+        )
+        # Google 인증과 서비스는 처음 필요할 때 준비 (시작 시 네트워크/로그인 대기 없음)
+        self.google_credentials = None
+        self._google_ready = False
+        self._google_services = {}
+        self._google_lock = threading.RLock()
+        self.google_credentials_file = google_credentials_file or os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
+        self.google_token_file = google_token_file
+        self.legacy_checkpoint_file = legacy_checkpoint_file
+        state_db_path = state_db_path or os.getenv('STATE_DB_PATH', 'processing_state.db')
+        self.state = ProcessingStateStore(state_db_path)
+        self.date_index = DateKeyIndex(self.reader, state_db_path)
+        self.dispatch_index = DispatchIndex(state_db_path)
+        self.last_scanned_key = None
+        if start_date:
+            self.last_message_key = self.get_first_message_key_from(start_date)
+            self.save_last_message_key(self.last_message_key)
+            self.state.flush()
+        else:
+            self.last_message_key = self.get_last_message_key()
+    
+    @property
+    def calendar_service(self):
+        """Google Calendar 서비스 (처음 사용할 때 생성)"""
+        return self.get_google_service('calendar')
+    
+    @calendar_service.setter
+    def calendar_service(self, service):
+        self._google_services['calendar'] = service
+    
+    @property
+    def tasks_service(self):
+        """Google Tasks 서비스 (처음 사용할 때 생성)"""
+        return self.get_google_service('tasks')
+    
+    @tasks_service.setter
+    def tasks_service(self, service):
+        self._google_services['tasks'] = service
+    
+    def get_google_credentials(self):
+        """Google 인증 정보 (처음 호출할 때 setup_google_apis 실행)"""
+        with self._google_lock:
+            if not self._google_ready:
+                # 네트워크 오류 등으로 실패하면 다음 호출에서 다시 시도
+                self.setup_google_apis()
+                self._google_ready = True
+            return self.google_credentials
+    
+    def get_google_service(self, name):
+        """Google API 서비스 (인증 정보가 없으면 None)"""
+        with self._google_lock:
+            if name not in self._google_services:
+                credentials = self.get_google_credentials()
+                if credentials is None:
+                    return None
+                self._google_services[name] = build_google_service(name, credentials)
+                logger.info(f"Google {name} API 준비 완료")
+            return self._google_services[name]
     
     def setup_google_apis(self):
-        """Google Calendar와 Tasks API 설정"""
+        """Google Calendar와 Tasks API 인증"""
+        from google.auth.transport.requests import Request
+        from google_auth_oauthlib.flow import InstalledAppFlow
         # 민감하지 않은 범위 사용 (검증 불필요)
         SCOPES = [
             'https://www.googleapis.com/auth/calendar.events',  # 이벤트만 관리
             'https://www.googleapis.com/auth/tasks.readonly'    # 읽기 전용으로 시작
         ]
         
-        credentials_file = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
+        credentials_file = self.google_credentials_file
+        token_file = self.google_token_file
         
         creds = None
-        if os.path.exists('token.pickle'):
-            with open('token.pickle', 'rb') as token:
+        if os.path.exists(token_file):
+            with open(token_file, 'rb') as token:
                 creds = pickle.load(token)
         
         if not creds or not creds.valid:
@@ -112,293 +337,692 @@ class CoolMessengerProcessor:
                     flow.fetch_token(code=auth_code)
                     creds = flow.credentials
             
-            with open('token.pickle', 'wb') as token:
+            with open(token_file, 'wb') as token:
                 pickle.dump(creds, token)
         
-        self.calendar_service = build('calendar', 'v3', credentials=creds)
-        self.tasks_service = build('tasks', 'v1', credentials=creds)
+        self.google_credentials = creds
     
     def get_last_message_key(self):
         """마지막으로 처리한 메시지 키 가져오기 (오늘부터 시작)"""
+        checkpoint = self.state.get_checkpoint()
+        if checkpoint is None and self.legacy_checkpoint_file:
+            # 예전 버전의 last_processed.txt가 있으면 그 값을 이어서 사용
+            checkpoint = self.state.import_legacy_checkpoint(self.legacy_checkpoint_file)
+        if checkpoint is not None:
+            return checkpoint
+        
+        # 저장된 체크포인트가 없으면 오늘 날짜 기준으로 시작
+        today = datetime.now().strftime('%Y-%m-%d')
+        return self.get_first_message_key_from(today)
+    
+    def get_first_message_key_from(self, date):
+        """해당 날짜(YYYY-MM-DD) 첫 번째 메시지 바로 앞의 키 찾기 (날짜 색인 사용)"""
         try:
-            with open('last_processed.txt', 'r') as f:
-                return int(f.read().strip())
-        except:
-            # 파일이 없으면 오늘 날짜 기준으로 시작
-            today = datetime.now().strftime('%Y/%m/%d')
-            return self.get_today_first_message_key(today)
-    
-    def get_today_first_message_key(self, today_date):
-        """오늘 첫 번째 메시지의 키를 찾기"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 오늘 날짜의 첫 번째 메시지 키 찾기
-            query = """
-            SELECT MIN(MessageKey) 
-            FROM tbl_recv 
-            WHERE DATE(ReceiveDate) = DATE(?) AND DeletedDate IS NULL
-            """
+            # 마지막으로 색인한 이후의 메시지만 색인에 추가
+            self.date_index.refresh()
+            result = self.date_index.first_key_on_or_after(date)
             
-            cursor.execute(query, (today_date,))
-            result = cursor.fetchone()[0]
-            conn.close()
-            
-            # 오늘 메시지가 없으면 현재 최대 키 반환 (새 메시지만 처리)
+            # 해당 날짜 이후 메시지가 없으면 현재 최대 키 반환 (새 메시지만 처리)
             if result is None:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute("SELECT MAX(MessageKey) FROM tbl_recv")
-                max_key = cursor.fetchone()[0]
-                conn.close()
+                max_key = self.reader.fetch_max_key()
                 return max_key if max_key else 0
             
             return result - 1  # 해당 메시지부터 포함하기 위해 -1
             
         except Exception as e:
-            logger.error(f"오늘 메시지 키 조회 오류: {e}")
+            logger.error(f"날짜별 메시지 키 조회 오류: {e}")
             return 0
     
     def save_last_message_key(self, message_key):
-        """마지막으로 처리한 메시지 키 저장"""
-        with open('last_processed.txt', 'w') as f:
-            f.write(str(message_key))
+        """마지막으로 처리한 메시지 키 저장 (상태 변경과 함께 커밋됨)"""
+        self.state.set_checkpoint(message_key)
     
     def get_new_messages(self):
-        """새로운 메시지들 가져오기"""
+        """새로운 메시지들을 묶음 단위로 읽으면서 하나씩 반환"""
+        # 새로운 메시지 조회 (MessageKey가 마지막 처리된 것보다 큰 것들)
+        return self.get_messages_between(self.last_message_key)
+    
+    def get_messages_between(self, after_key, until_key=None):
+        """after_key 초과 until_key 이하(없으면 끝까지) 메시지를 묶음 단위로 읽으면서 하나씩 반환"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 새로운 메시지 조회 (MessageKey가 마지막 처리된 것보다 큰 것들)
             # 삭제되지 않은 메시지만 가져오기 (DeletedDate가 NULL)
-            query = """
-            SELECT MessageKey, MessageBody, Title, Sender, SenderKey, 
-                   MessageType, ReceiveDate, MessageText, MemoID, 
-                   ReferenceList, CCList, FilePath, IsUnRead
-            FROM tbl_recv 
-            WHERE MessageKey > ? AND DeletedDate IS NULL
-            ORDER BY MessageKey ASC
-            """
-            
-            cursor.execute(query, (self.last_message_key,))
-            messages = cursor.fetchall()
-            conn.close()
-            
-            return messages
+            # 전체를 한 번에 읽지 않고 FETCH_BATCH_SIZE개씩 나누어 읽음
+            batches = self.reader.iter_new_messages(after_key, until_key=until_key)
+            self.last_scanned_key = None
+            while True:
+                with self.metrics.timer('fetch'):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                for message in batch:
+                    self.last_scanned_key = message[0]
+                    yield message
             
         except Exception as e:
             logger.error(f"데이터베이스 오류: {e}")
-            return []
     
-    def analyze_message_with_ai(self, message_text, sender, title):
-        """OpenAI를 사용하여 메시지 분석 (캘린더 우선)"""
-        prompt = f"""
+    def build_analysis_prompt(self, message_text, sender, title):
+        """메시지 분석용 프롬프트 생성"""
+        return f"""
         다음은 한국 학교에서 온 메시지입니다. 이 메시지에서 일정이나 할일을 추출해주세요.
 
         발신자: {sender}
         제목: {title}
         내용: {message_text}
-
-        분류 우선순위:
-        1. CALENDAR 우선: 날짜/시간이 언급되거나 특정 시점의 활동이면 무조건 "calendar"
-        2. 회의, 행사, 수업, 활동, 모임, 시간표 관련 = "calendar"
-        3. 마감일이 있는 과제, 제출물 = "calendar" (마감일을 일정으로)
-        4. 단순 확인, 회신, 준비만 필요한 것 = "todo"
-        5. 공지, 안내만 하는 것 = "info"
-
+{ANALYSIS_RULES}
         반드시 JSON 형식으로만 응답하세요:
-        {{
-            "type": "calendar|todo|info",
-            "priority": "high|medium|low",
-            "title": "간단한 제목",
-            "description": "상세 설명",
-            "date": "2025-MM-DD",
-            "time": "HH:MM",
-            "deadline": "2025-MM-DD",
-            "category": "수업|회의|행사|과제|기타"
-        }}
-
-        날짜 추출 규칙 (현재: 2025년 5월 29일 목요일):
-        - "오늘" = 2025-05-29
-        - "내일" = 2025-05-30  
-        - "금요일", "이번 금요일" = 2025-05-30
-        - "다음주 월요일" = 2025-06-02
-        - "6월 3일" = 2025-06-03
-        - 시간: "오후 2시" = 14:00, "9시 30분" = 09:30
+        {{{ANALYSIS_FIELDS}        }}
+{ANALYSIS_DATE_RULES}        """
+    
+    def build_batch_prompt(self, items):
+        """여러 메시지를 한 번에 분석하는 프롬프트 생성 (MessageKey별 결과를 analyses 배열로 응답)"""
+        messages = "\n".join(
+            f"""
+        [메시지 {item['message_key']}]
+        발신자: {item['sender']}
+        제목: {item['title']}
+        내용: {self.prompt_text(item)}"""
+            for item in items
+        )
+        return f"""
+        다음은 한국 학교에서 온 메시지 {len(items)}개입니다. 각 메시지에서 일정이나 할일을 추출해주세요.
+{messages}
+{ANALYSIS_RULES}
+        반드시 JSON 형식으로만 응답하세요. analyses 배열에 메시지마다 하나씩, message_key에 메시지 번호를 넣으세요:
+        {{"analyses": [
+          {{
+            "message_key": 메시지 번호,{ANALYSIS_FIELDS}          }}
+        ]}}
+{ANALYSIS_DATE_RULES}        """
+    
+    def parse_analysis_response(self, result):
+        """AI 응답 텍스트를 분석 결과 dict로 변환 (구조화된 출력이므로 바로 JSON)"""
+        logger.info(f"🤖 AI 원본 응답: {result}")
+        parsed_result = json.loads(result)
         
-        중요: 시간/날짜가 조금이라도 언급되면 반드시 "calendar"로 분류하세요!
-        """
+        # 날짜가 있으면 자동으로 calendar로 변경
+        if parsed_result.get('date') or parsed_result.get('deadline'):
+            if parsed_result['type'] == 'todo':
+                parsed_result['type'] = 'calendar'
+                logger.info("📅 날짜 발견 → 자동으로 캘린더로 변경")
         
-        try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "당신은 JSON만 반환하는 AI입니다. 학교 일정을 캘린더 중심으로 분류하세요."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
-            )
+        return parsed_result
+    
+    def parse_batch_response(self, result, items):
+        """묶음 응답({"analyses": [...]})을 {MessageKey: 분석 결과}로 변환 (형식이 잘못된 항목은 제외)"""
+        logger.info(f"🤖 AI 묶음 응답 ({len(items)}개): {result}")
+        parsed = json.loads(result)
+        if not isinstance(parsed, dict) or not isinstance(parsed.get('analyses'), list):
+            raise ValueError("응답에 analyses 배열이 없음")
+        
+        items_by_key = {item['message_key']: item for item in items}
+        analyses = {}
+        for entry in parsed['analyses']:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                message_key = int(entry.pop('message_key'))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if message_key not in items_by_key or entry.get('type') not in ('calendar', 'todo', 'info'):
+                continue
             
-            result = response.choices[0].message.content.strip()
-            logger.info(f"🤖 AI 원본 응답: {result}")
+            # 날짜가 있으면 자동으로 calendar로 변경
+            if (entry.get('date') or entry.get('deadline')) and entry['type'] == 'todo':
+                entry['type'] = 'calendar'
             
-            # JSON 파싱 시도
-            try:
-                parsed_result = json.loads(result)
-                
-                # 날짜가 있으면 자동으로 calendar로 변경
-                if parsed_result.get('date') or parsed_result.get('deadline'):
-                    if parsed_result['type'] == 'todo':
-                        parsed_result['type'] = 'calendar'
-                        logger.info("📅 날짜 발견 → 자동으로 캘린더로 변경")
-                
-                return parsed_result
-                
-            except json.JSONDecodeError:
-                # JSON 파싱 실패시 텍스트에서 JSON 추출 시도
-                json_start = result.find('{')
-                json_end = result.rfind('}') + 1
-                if json_start != -1 and json_end != 0:
-                    json_text = result[json_start:json_end]
-                    return json.loads(json_text)
-                else:
-                    raise ValueError("JSON 형식을 찾을 수 없음")
+            analyses[message_key] = entry
+        return analyses
+    
+    def fallback_analysis(self, message_text, title):
+        """AI 분석 실패시 기본 분석 결과 (캘린더 우선)"""
+        return {
+            "type": "calendar",  # 기본값을 캘린더로 변경
+            "priority": "medium",
+            "title": title[:50] if title else "메시지",
+            "description": message_text[:100] if message_text else "내용 없음",
+            "date": datetime.now().strftime('%Y-%m-%d'),  # 오늘 날짜 기본값
+            "time": "09:00",  # 기본 시간
+            "deadline": None,
+            "category": "기타"
+        }
+    
+    def analyze_locally(self, message_text, sender, title):
+        """규칙 기반 분류기로 분석 (신뢰도가 기준 미만이면 None)"""
+        if not self.local_classifier_enabled:
+            return None
+        analysis, confidence = local_classifier.classify(sender, title, message_text)
+        if analysis is None or confidence < self.local_classifier_threshold:
+            return None
+        logger.info(f"⚡ 규칙 기반 분류 사용 (신뢰도 {confidence:.2f})")
+        return analysis
+    
+    def send_openai_request(self, operation):
+        """OpenAI 요청 보내기 (operation: 분석 흐름이 yield한 (요청 인자, 예상 토큰 수))"""
+        request, tokens = operation
+        # 분당 요청/토큰 제한에 맞춰 대기
+        with self.metrics.timer('rate_limit'):
+            self.rate_limiter.acquire(tokens)
+        with self.metrics.timer('openai'):
+            return self.openai_client.chat.completions.create(**request)
+    
+    def single_analysis_steps(self, message_text, sender, title, prompt_text=None, escalated=False):
+        """메시지 하나를 OpenAI에 요청해 분석하는 흐름 (실패하면 기본값)
+
+        prompt_text를 주면 프롬프트에는 정리한 텍스트를 넣고, 캐시 키와 기본값은
+        원래 message_text로 만듭니다. 모델은 self.router가 고르며, escalated=True면
+        묶음 분석에서 애매했던 메시지이므로 큰 모델로 바로 요청합니다.
+        """
+        prompt = self.build_analysis_prompt(prompt_text or message_text, sender, title)
+        try:
+            analysis = yield from self.router.analysis_steps(
+                prompt, prompt_text or message_text, self.parse_analysis_response,
+                escalated=escalated, tokens=estimate_tokens(prompt))
+            self.analysis_cache.put(sender, title, message_text, analysis)
+            return analysis
             
         except Exception as e:
             logger.error(f"AI 분석 오류: {e}")
-            logger.error(f"응답 내용: {result if 'result' in locals() else 'N/A'}")
+            self.metrics.error('analyze')
             
             # 오류 발생시 기본값 반환 (캘린더 우선)
-            return {
-                "type": "calendar",  # 기본값을 캘린더로 변경
-                "priority": "medium",
-                "title": title[:50] if title else "메시지",
-                "description": message_text[:100] if message_text else "내용 없음",
-                "date": datetime.now().strftime('%Y-%m-%d'),  # 오늘 날짜 기본값
-                "time": "09:00",  # 기본 시간
-                "deadline": None,
-                "category": "기타"
-            }
-    
-    def add_to_calendar(self, event_data):
-        """Google Calendar에 일정 추가"""
+            return self.fallback_analysis(message_text, title)
+    
+    def build_calendar_event(self, event_data):
+        """분석 결과로 Google Calendar 이벤트 본문 생성 (날짜가 없으면 None)"""
+        # 날짜/시간 처리 (구조화된 출력에서는 값이 없으면 키가 있고 null)
+        date = event_data.get('date') or event_data.get('deadline')
+        if not date:
+            return None
+        start_datetime = f"{date}T{event_data.get('time') or '09:00'}:00+09:00"
+        end_time = datetime.fromisoformat(start_datetime.replace('+09:00', '')) + timedelta(hours=1)
+        end_datetime = end_time.strftime("%Y-%m-%dT%H:%M:%S+09:00")
+        
+        return {
+            'summary': event_data['title'],
+            'description': event_data['description'],
+            'start': {
+                'dateTime': start_datetime,
+                'timeZone': 'Asia/Seoul',
+            },
+            'end': {
+                'dateTime': end_datetime,
+                'timeZone': 'Asia/Seoul',
+            },
+            'colorId': '1' if event_data['priority'] == 'high' else '2'
+        }
+    
+    def build_task(self, task_data):
+        """분석 결과로 Google Tasks 할일 본문 생성"""
+        task = {
+            'title': task_data['title'],
+            'notes': task_data['description'],
+        }
+        
+        if 'deadline' in task_data and task_data['deadline']:
+            task['due'] = f"{task_data['deadline']}T00:00:00.000Z"
+        
+        return task
+    
+    def skip_undated_event(self, event_data):
+        """날짜가 없는 일정은 추가하지 않고 처리 완료로 넘김"""
+        logger.warning(f"⚠️ 날짜가 없어 캘린더에 추가하지 않음: {event_data.get('title', 'No Title')}")
+        return True
+    
+    def plan_google_item(self, kind, analysis, body, sender, message_key):
+        """중복 색인 확인 후 ('insert'|'update'|'skip', 지문, 기존 Google ID) 반환"""
+        fingerprint = DispatchIndex.fingerprint(kind, analysis, sender)
+        existing = self.dispatch_index.reserve(fingerprint, kind, message_key, body)
+        if existing is None:
+            return 'insert', fingerprint, None
+        google_id, old_hash = existing
+        if google_id is None or old_hash == body_hash(body):
+            # 다른 스레드가 추가 중이거나 내용이 같은 항목이 이미 있음
+            return 'skip', fingerprint, google_id
+        return 'update', fingerprint, google_id
+    
+    def google_item_steps(self, kind, analysis, body, sender, message_key, label):
+        """중복 색인을 확인해 Google 항목을 추가/수정/건너뛰는 흐름
+
+        Google 요청이 필요하면 ('insert'|'patch', 종류, 본문, Google ID)를 yield하고
+        응답을 받습니다 (dispatch_item은 execute_google_request로 실행).
+        """
+        action, fingerprint, google_id = self.plan_google_item(kind, analysis, body, sender, message_key)
+        if action == 'skip':
+            logger.info(f"🔁 이미 추가된 {label}이라 건너뜀: {analysis['title']}")
+            return True
+        if action == 'update':
+            yield 'patch', kind, body, google_id
+            self.dispatch_index.update_body(fingerprint, body)
+            logger.info(f"{label} 수정됨: {analysis['title']}")
+            return True
+        
         try:
-            # 날짜/시간 처리
-            start_datetime = f"{event_data['date']}T{event_data.get('time', '09:00')}:00+09:00"
-            end_time = datetime.fromisoformat(start_datetime.replace('+09:00', '')) + timedelta(hours=1)
-            end_datetime = end_time.strftime("%Y-%m-%dT%H:%M:%S+09:00")
-            
-            event = {
-                'summary': event_data['title'],
-                'description': event_data['description'],
-                'start': {
-                    'dateTime': start_datetime,
-                    'timeZone': 'Asia/Seoul',
-                },
-                'end': {
-                    'dateTime': end_datetime,
-                    'timeZone': 'Asia/Seoul',
-                },
-                'colorId': '1' if event_data['priority'] == 'high' else '2'
-            }
-            
-            event = self.calendar_service.events().insert(
-                calendarId='primary', body=event).execute()
-            logger.info(f"캘린더 일정 추가됨: {event_data['title']}")
+            created = yield 'insert', kind, body, None
+        except Exception:
+            self.dispatch_index.release(fingerprint)
+            raise
+        self.dispatch_index.complete(fingerprint, (created or {}).get('id'))
+        logger.info(f"{label} 추가됨: {analysis['title']}")
+        return True
+    
+    def execute_google_request(self, operation):
+        """google_item_steps가 yield한 요청을 Google API 클라이언트로 실행"""
+        action, kind, body, google_id = operation
+        if kind == 'calendar':
+            events = self.calendar_service.events()
+            if action == 'insert':
+                request = events.insert(calendarId='primary', body=body)
+            else:
+                request = events.patch(calendarId='primary', eventId=google_id, body=body)
+        else:
+            tasks = self.tasks_service.tasks()
+            if action == 'insert':
+                request = tasks.insert(tasklist='@default', body=body)
+            else:
+                request = tasks.patch(tasklist='@default', task=google_id, body=body)
+        with self.metrics.timer('google'):
+            return request.execute()
+    
+    def send_analysis_steps(self, analysis, sender=None, message_key=None):
+        """분석 결과 유형에 따라 캘린더/할일에 추가하는 흐름 (성공 여부 반환)"""
+        kind = analysis.get('type')
+        if kind == 'info':
+            logger.info(f"📋 정보성 메시지로 분류: {analysis.get('title', 'No Title')}")
+            return True
+        if kind not in ('calendar', 'todo'):
+            return True
+        
+        label = "캘린더 일정" if kind == 'calendar' else "할일"
+        try:
+            if kind == 'calendar':
+                body = self.build_calendar_event(analysis)
+                if body is None:
+                    return self.skip_undated_event(analysis)
+            else:
+                body = self.build_task(analysis)
+            return (yield from self.google_item_steps(kind, analysis, body, sender, message_key, label))
             
         except Exception as e:
-            logger.error(f"캘린더 추가 오류: {e}")
+            logger.error(f"{label} 추가 오류: {e}")
+            return False
     
-    def add_to_tasks(self, task_data):
-        """Google Tasks에 할일 추가"""
-        try:
-            task = {
-                'title': task_data['title'],
-                'notes': task_data['description'],
-            }
+    def send_analysis(self, analysis, sender=None, message_key=None):
+        """분석 결과 유형에 따라 캘린더/할일에 추가 (성공 여부 반환)"""
+        return run_steps(self.send_analysis_steps(analysis, sender, message_key),
+                         self.execute_google_request)
+    
+    def send_analyses_batch(self, pairs):
+        """여러 분석 결과를 Google 배치 요청으로 추가하고 {MessageKey: 성공 여부} 반환"""
+        results = {}
+        events = {}
+        tasks = {}
+        for item, analysis in pairs:
+            message_key = item['message_key']
+            kind = analysis.get('type')
+            if kind not in ('calendar', 'todo'):
+                results[message_key] = self.send_analysis(analysis, item['sender'], message_key)
+                continue
+            try:
+                if kind == 'calendar':
+                    body = self.build_calendar_event(analysis)
+                    if body is None:
+                        results[message_key] = self.skip_undated_event(analysis)
+                        continue
+                else:
+                    body = self.build_task(analysis)
+                action, fingerprint, _ = self.plan_google_item(
+                    kind, analysis, body, item['sender'], message_key)
+            except Exception as e:
+                logger.error(f"요청 생성 오류: {e}")
+                results[message_key] = False
+                continue
             
-            if 'deadline' in task_data and task_data['deadline']:
-                task['due'] = f"{task_data['deadline']}T00:00:00.000Z"
+            if action == 'insert':
+                target = events if kind == 'calendar' else tasks
+                target[message_key] = (analysis, body, fingerprint)
+            else:
+                # 중복(건너뛰기/수정)은 드물어서 하나씩 처리 (새로 예약한 것이 없음)
+                results[message_key] = self.send_analysis(analysis, item['sender'], message_key)
+        
+        if events:
+            results.update(self.execute_google_batch(
+                self.calendar_service, events, "캘린더 일정",
+                lambda service, body: service.events().insert(calendarId='primary', body=body)))
+        if tasks:
+            results.update(self.execute_google_batch(
+                self.tasks_service, tasks, "할일",
+                lambda service, body: service.tasks().insert(tasklist='@default', body=body)))
+        return results
+    
+    def execute_google_batch(self, service, requests, label, make_request):
+        """Google API 배치 요청 실행 (실패한 하위 요청만 재시도)"""
+        results = {}
+        if service is None:
+            logger.error(f"{label} 추가 오류: Google API가 설정되지 않았습니다")
+            for analysis, body, fingerprint in requests.values():
+                self.dispatch_index.release(fingerprint)
+            return {message_key: False for message_key in requests}
+        
+        remaining = dict(requests)
+        for attempt in range(GOOGLE_BATCH_RETRIES + 1):
+            if not remaining:
+                break
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+                logger.warning(f"⚠️ 실패한 {label} {len(remaining)}개 다시 시도 ({attempt}/{GOOGLE_BATCH_RETRIES})")
             
-            result = self.tasks_service.tasks().insert(
-                tasklist='@default', body=task).execute()
-            logger.info(f"할일 추가됨: {task_data['title']}")
+            failed = {}
             
+            def callback(request_id, response, exception):
+                message_key = int(request_id)
+                analysis, body, fingerprint = remaining[message_key]
+                if exception is None:
+                    results[message_key] = True
+                    self.dispatch_index.complete(fingerprint, (response or {}).get('id'))
+                    logger.info(f"{label} 추가됨: {analysis['title']}")
+                elif is_retryable_google_error(exception):
+                    failed[message_key] = remaining[message_key]
+                else:
+                    results[message_key] = False
+                    self.dispatch_index.release(fingerprint)
+                    logger.error(f"{label} 추가 오류: {exception}")
+            
+            keys = list(remaining)
+            for start in range(0, len(keys), GOOGLE_BATCH_LIMIT):
+                batch = service.new_batch_http_request(callback=callback)
+                for message_key in keys[start:start + GOOGLE_BATCH_LIMIT]:
+                    batch.add(make_request(service, remaining[message_key][1]),
+                              request_id=str(message_key))
+                try:
+                    with self.metrics.timer('google'):
+                        batch.execute()
+                except Exception as e:
+                    # 배치 전체가 실패하면 응답을 받지 못한 하위 요청을 모두 재시도
+                    logger.error(f"{label} 배치 요청 오류: {e}")
+                    for message_key in keys[start:start + GOOGLE_BATCH_LIMIT]:
+                        if message_key not in results:
+                            failed[message_key] = remaining[message_key]
+            remaining = failed
+        
+        for message_key, (analysis, body, fingerprint) in remaining.items():
+            logger.error(f"{label} 추가 오류: 재시도 후에도 실패 (메시지 {message_key})")
+            self.dispatch_index.release(fingerprint)
+            results[message_key] = False
+        return results
+    
+    def log_normalizer_stats(self, prefix=''):
+        """메시지 정리로 줄어든 토큰 수 기록"""
+        stats = self.normalizer.stats()
+        if stats['messages']:
+            logger.info(f"✂️ {prefix}메시지 정리: {stats['messages']}개, "
+                        f"토큰 {stats['original_tokens']:,} → {stats['cleaned_tokens']:,} "
+                        f"({stats['tokens_saved']:,} 절약, 잘림 {stats['truncated']}개)")
+    
+    def log_router_stats(self, prefix=''):
+        """모델 단계별 요청 수, 지연 시간, 큰 모델로 올린 비율 기록"""
+        for name, stats in self.router.stats().items():
+            if stats['requests']:
+                logger.info(f"🧭 {prefix}{name}({stats['model']}): 요청 {stats['requests']}회 "
+                            f"(메시지 {stats['messages']}개, 오류 {stats['errors']}회), "
+                            f"지연 평균 {stats['latency_avg']:.2f}초 / 최대 {stats['latency_max']:.2f}초, "
+                            f"상향 {stats['escalation_rate']:.0%}")
+    
+    def close(self):
+        """DB 연결과 저장소 닫기 (함께 쓰는 분석 캐시는 만든 쪽에서 닫음)"""
+        self.reader.close()
+        self.state.close()
+        self.date_index.close()
+        self.dispatch_index.close()
+        if self.owns_analysis_cache:
+            self.analysis_cache.close()
+    
+    def has_new_messages(self):
+        """마지막으로 처리한 키 이후에 새로 추가된 행이 있는지 확인 (오류면 False)"""
+        try:
+            with self.metrics.timer('check'):
+                return self.reader.has_new_messages(self.last_message_key)
         except Exception as e:
-            logger.error(f"할일 추가 오류: {e}")
+            logger.error(f"데이터베이스 변경 확인 오류: {e}")
+            return False
     
     def process_new_messages(self):
-        """새로운 메시지들 처리"""
-        messages = self.get_new_messages()
+        """새로운 메시지들 처리 (처리한 메시지 수 반환)"""
+        # 새로 추가된 행이 없으면 전체 조회 생략
+        if not self.has_new_messages():
+            return 0
         
-        for message in messages:
-            message_key, body, title, sender, sender_key, msg_type, receive_date, msg_text, memo_id, ref_list, cc_list, file_path, is_unread = message
-            
-            # 메시지 텍스트 결정 (MessageText가 있으면 우선 사용)
-            content = msg_text if msg_text else body
-            if not content:
-                content = title  # 제목이라도 있으면 사용
-            
-            if not content:
+        # 분석은 작업자 풀에서 동시에, 전송과 체크포인트는 MessageKey 순서대로
+        with self.metrics.timer('pass'):
+            processed = self.pipeline.run(self.get_new_messages())
+            self.checkpoint_scanned()
+            self.state.flush()
+        return processed
+    
+    def checkpoint_scanned(self):
+        """마지막 처리 메시지 뒤로 내용 없는 메시지만 있었으면 체크포인트를 조회한 끝까지 이동
+        
+        그대로 두면 has_new_messages가 같은 빈 메시지 때문에 매번 전체 조회를 합니다.
+        """
+        if self.last_scanned_key is not None and self.last_scanned_key > self.last_message_key:
+            self.last_message_key = self.last_scanned_key
+            self.save_last_message_key(self.last_scanned_key)
+    
+    def prepare_message(self, message):
+        """조회 단계: DB 행을 처리 항목으로 변환 (내용이 없으면 None)"""
+        message_key, body, title, sender, sender_key, msg_type, receive_date, msg_text, memo_id, ref_list, cc_list, file_path, is_unread = message
+        
+        # 메시지 텍스트 결정 (MessageText가 있으면 우선 사용)
+        content = msg_text if msg_text else body
+        if not content:
+            content = title  # 제목이라도 있으면 사용
+        
+        if not content:
+            return None
+        
+        status, analysis = self.state.get_state(message_key)
+        return {
+            'message_key': message_key,
+            'content': content,
+            'title': title,
+            'sender': sender,
+            'msg_type': msg_type,
+            'receive_date': receive_date,
+            'file_path': file_path,
+            'status': status,
+            'analysis': analysis,
+        }
+    
+    def needs_analysis(self, item):
+        """AI 분석이 필요한지 확인 (필요하면 fetched 상태로 기록)"""
+        status = item['status']
+        if self.is_done(item):
+            return False
+        if status == ProcessingStateStore.ANALYSED and item['analysis']:
+            # 이전 실행에서 분석까지 끝난 메시지는 AI를 다시 호출하지 않음
+            return False
+        
+        self.state.mark(item['message_key'], ProcessingStateStore.FETCHED)
+        return True
+    
+    def split_for_analysis(self, items, track_state=True):
+        """저장된 결과/규칙/캐시로 끝나는 항목과 AI 분석이 필요한 항목으로 나누기
+
+        track_state=False면 상태 저장소에 기록하지 않고 저장된 분석 결과만 재사용합니다 (백필용).
+        """
+        analyses = {}
+        pending = []
+        for item in items:
+            message_key = item['message_key']
+            if not track_state and item['analysis']:
+                analyses[message_key] = item['analysis']
                 continue
-            
-            logger.info(f"새 메시지 처리: {sender} - {title}")
-            logger.info(f"받은 날짜: {receive_date}")
-            logger.info(f"메시지 유형: {msg_type}")
-            
-            # AI로 메시지 분석
-            analysis = self.analyze_message_with_ai(content, sender, title)
-            
-            if analysis and isinstance(analysis, dict):
-                logger.info(f"✅ AI 분석 결과: {analysis.get('type', 'unknown')} - {analysis.get('title', 'No Title')}")
-                
-                if analysis.get('type') == 'calendar':
-                    self.add_to_calendar(analysis)
-                elif analysis.get('type') == 'todo':
-                    self.add_to_tasks(analysis)
-                elif analysis.get('type') == 'info':
-                    logger.info(f"📋 정보성 메시지로 분류: {analysis.get('title', 'No Title')}")
-                    
-                # 중요한 메시지나 파일이 첨부된 경우 로그 남기기
-                if file_path or analysis.get('priority') == 'high':
-                    logger.info(f"📎 첨부파일: {file_path}" if file_path else "⚠️ 중요 메시지")
+            if track_state and not self.needs_analysis(item):
+                analyses[message_key] = item['analysis']
+                continue
+            local = self.analyze_locally(item['content'], item['sender'], item['title'])
+            if local is None:
+                local = self.analysis_cache.get(item['sender'], item['title'], item['content'])
+            if local is not None:
+                analyses[message_key] = local
             else:
-                logger.error(f"❌ AI 분석 실패 또는 잘못된 형식")
-                logger.error(f"분석 결과: {analysis}")
-            
-            logger.info("-" * 50)  # 구분선
-            
-            # 처리된 메시지 키 업데이트
+                pending.append(item)
+        return analyses, pending
+    
+    def prompt_text(self, item):
+        """AI에 보낼 메시지 내용 (서식/이전 메시지를 지우고 토큰 예산에 맞춰 자름)"""
+        return self.normalizer.normalize(item['message_key'], item['content'])
+    
+    def batchable_items(self, items):
+        """묶음 분석에 넣을 항목 (정리한 뒤에도 긴 메시지는 따로 분석)"""
+        return [item for item in items if len(self.prompt_text(item)) <= self.batch_max_chars]
+    
+    def analyze_items(self, items, track_state=True):
+        """분석 단계: 작업자 스레드에서 항목들을 분석해 {MessageKey: 분석 결과} 반환"""
+        with self.metrics.timer('analyze'):
+            return run_steps(self.analysis_steps(items, track_state), self.send_openai_request)
+    
+    def analysis_steps(self, items, track_state=True):
+        """항목들을 분석하는 흐름 (OpenAI 요청마다 (요청 인자, 예상 토큰 수)를 yield)
+
+        요청은 실행하는 쪽이 보냅니다 (스레드 엔진은 send_openai_request,
+        asyncio 엔진은 AsyncOpenAI).
+        """
+        analyses, pending = self.split_for_analysis(items, track_state)
+        
+        escalate = set()
+        batch = self.batchable_items(pending)
+        if len(batch) > 1:
+            batch_analyses, escalate = yield from self.batch_analysis_steps(batch)
+            analyses.update(batch_analyses)
+        
+        # 묶음에서 빠졌거나 형식이 잘못된 항목은 하나씩, 애매했던 항목은 큰 모델로 분석
+        for item in pending:
+            if item['message_key'] not in analyses:
+                analyses[item['message_key']] = yield from self.single_analysis_steps(
+                    item['content'], item['sender'], item['title'], self.prompt_text(item),
+                    escalated=item['message_key'] in escalate)
+        return analyses
+    
+    def batch_analysis_steps(self, items):
+        """여러 메시지를 한 번의 요청으로 분석하는 흐름
+
+        ({MessageKey: 결과}, 큰 모델로 보낼 키)를 반환하며 실패하면 빈 결과입니다.
+        """
+        prompt = self.build_batch_prompt(items)
+        tier = self.router.choose_tier([self.prompt_text(item) for item in items])
+        started = time.monotonic()
+        try:
+            response = yield (self.router.build_request(prompt, tier, batch=True),
+                              estimate_tokens(prompt, completion_tokens=250 * len(items)))
+            analyses = self.parse_batch_response(self.router.response_text(response), items)
+        except Exception as e:
+            logger.error(f"AI 묶음 분석 오류: {e}")
+            self.metrics.error('analyze')
+            self.router.record(tier, time.monotonic() - started, error=True, messages=len(items))
+            return {}, set()
+        return self.finish_batch(analyses, items, tier, started)
+    
+    def finish_batch(self, analyses, items, tier, started):
+        """묶음 결과를 기록하고 확실한 결과만 캐시에 저장 (애매한 항목은 큰 모델로 보낼 키로 분리)"""
+        analyses, escalate = self.router.split_batch(analyses, tier, started, len(items))
+        items_by_key = {item['message_key']: item for item in items}
+        for message_key, analysis in analyses.items():
+            item = items_by_key[message_key]
+            self.analysis_cache.put(item['sender'], item['title'], item['content'], analysis)
+        
+        invalid = len(items) - len(analyses) - len(escalate)
+        if invalid:
+            logger.warning(f"⚠️ 묶음 응답 중 {invalid}개가 잘못되어 하나씩 다시 분석합니다")
+        if escalate:
+            logger.info(f"⬆️ 묶음 응답 중 {len(escalate)}개가 애매해서 큰 모델로 다시 분석합니다")
+        return analyses, set(escalate)
+    
+    def dispatch_item(self, item, analysis):
+        """전송 단계: MessageKey 순서대로 Google에 추가하고 체크포인트 갱신"""
+        run_steps(self.dispatch_steps(item, analysis), self.execute_google_request)
+    
+    def dispatch_steps(self, item, analysis):
+        """항목 하나를 전송하는 흐름 (Google 요청은 google_item_steps처럼 yield)"""
+        dispatched = False
+        if self.begin_dispatch(item, analysis):
+            dispatched = yield from self.send_analysis_steps(analysis, item['sender'], item['message_key'])
+        self.finish_dispatch(item, analysis, dispatched)
+    
+    def dispatch_items(self, pairs):
+        """전송 단계 (묶음): [(항목, 분석 결과)]를 Google 배치 요청으로 보내고 순서대로 마무리"""
+        if len(pairs) == 1:
+            self.dispatch_item(*pairs[0])
+        else:
+            sendable = [(item, analysis) for item, analysis in pairs
+                        if self.begin_dispatch(item, analysis)]
+            results = self.send_analyses_batch(sendable)
+            for item, analysis in pairs:
+                self.finish_dispatch(item, analysis, results.get(item['message_key'], False))
+        # 묶음의 상태 변경과 체크포인트를 한 트랜잭션으로 기록
+        self.state.flush()
+    
+    def is_done(self, item):
+        """이전 실행에서 이미 처리 완료된 메시지인지 확인"""
+        return item['status'] in (ProcessingStateStore.DISPATCHED, ProcessingStateStore.FAILED)
+    
+    def begin_dispatch(self, item, analysis):
+        """전송 전 처리 (전송할 필요가 없으면 False, 체크포인트는 finish_dispatch에서 갱신)"""
+        if self.is_done(item):
+            return False
+        
+        logger.info(f"새 메시지 처리: {item['sender']} - {item['title']}")
+        logger.info(f"받은 날짜: {item['receive_date']}")
+        logger.info(f"메시지 유형: {item['msg_type']}")
+        
+        if analysis is item['analysis'] and analysis:
+            logger.info("♻️ 저장된 분석 결과 사용")
+        
+        if not analysis or not isinstance(analysis, dict):
+            logger.error(f"❌ AI 분석 실패 또는 잘못된 형식")
+            logger.error(f"분석 결과: {analysis}")
+            return False
+        
+        self.state.mark(item['message_key'], ProcessingStateStore.ANALYSED, analysis=analysis)
+        logger.info(f"✅ AI 분석 결과: {analysis.get('type', 'unknown')} - {analysis.get('title', 'No Title')}")
+        return True
+    
+    def finish_dispatch(self, item, analysis, dispatched):
+        """전송 후 처리: 상태 기록과 체크포인트 갱신"""
+        message_key = item['message_key']
+        
+        if self.is_done(item):
+            # 이전 실행에서 이미 처리 완료된 메시지는 체크포인트만 갱신
             self.last_message_key = message_key
             self.save_last_message_key(message_key)
-            
-            # API 제한을 위한 잠시 대기
-            time.sleep(1)
-
-class DatabaseWatcher(FileSystemEventHandler):
-    """데이터베이스 파일 변경 감지"""
-    def __init__(self, processor):
-        self.processor = processor
-        self.last_modified = 0
-        
-    def on_modified(self, event):
-        if event.is_directory:
             return
-            
-        # .udb 파일만 감지
-        if event.src_path.endswith('.udb'):
-            current_time = time.time()
-            # 중복 이벤트 방지 (1초 내 중복 이벤트 무시)
-            if current_time - self.last_modified > 1:
-                self.last_modified = current_time
-                logger.info(f"📝 데이터베이스 변경 감지: {event.src_path}")
-                logger.info(f"⏰ {datetime.now().strftime('%H:%M:%S')} - 새 메시지 처리 중...")
-                
-                # 잠시 대기 후 처리 (파일 쓰기 완료 대기)
-                time.sleep(0.5)
-                self.processor.process_new_messages()
+        
+        if analysis and isinstance(analysis, dict):
+            # 중요한 메시지나 파일이 첨부된 경우 로그 남기기
+            file_path = item['file_path']
+            if file_path or analysis.get('priority') == 'high':
+                logger.info(f"📎 첨부파일: {file_path}" if file_path else "⚠️ 중요 메시지")
+        
+        status = ProcessingStateStore.DISPATCHED if dispatched else ProcessingStateStore.FAILED
+        self.metrics.processed()
+        if not dispatched:
+            self.metrics.error('dispatch')
+        logger.info("-" * 50)  # 구분선
+        
+        # 처리된 메시지 키 업데이트 (커밋은 dispatch_items에서 묶음마다 한 번)
+        self.last_message_key = message_key
+        self.save_last_message_key(message_key)
+        self.state.mark(message_key, status)
+
+def load_tray_app():
+    """시스템 트레이 클래스 (pystray/Pillow가 없으면 None)"""
+    try:
+        from system_tray import SystemTrayApp
+        return SystemTrayApp
+    except ImportError:
+        print("⚠️ 시스템 트레이 기능을 사용하려면 pystray와 Pillow를 설치하세요:")
+        print("pip install pystray Pillow")
+        return None
 
 def main():
     parser = argparse.ArgumentParser(description='CoolMessenger AI 자동화')
@@ -406,6 +1030,21 @@ def main():
     parser.add_argument('--remove-startup', action='store_true', help='윈도우 시작 프로그램 제거')
     parser.add_argument('--background', action='store_true', help='백그라운드 모드로 실행')
     parser.add_argument('--no-tray', action='store_true', help='시스템 트레이 비활성화')
+    parser.add_argument('--start-date', help='이 날짜(YYYY-MM-DD)의 메시지부터 다시 처리')
+    parser.add_argument('--engine', choices=['thread', 'async'], default='thread',
+                        help='실행 엔진 (thread: 작업자 스레드, async: asyncio 이벤트 루프)')
+    parser.add_argument('--mailboxes', default=os.getenv('MAILBOXES_FILE'),
+                        help='여러 메일함을 한 번에 처리할 메일함 목록 파일 (JSON)')
+    parser.add_argument('--shards', type=int, default=int(os.getenv('MAILBOX_SHARDS', '1')),
+                        help='메일함을 나눠 처리할 프로세스 수 (--mailboxes와 함께 사용)')
+    parser.add_argument('--backfill', nargs=2, metavar=('FROM', 'TO'),
+                        help='지난 메시지 다시 분석 (MessageKey 또는 YYYY-MM-DD 범위, 양 끝 포함)')
+    parser.add_argument('--commit', action='store_true',
+                        help='--backfill 결과를 Google에 추가 (없으면 dry-run으로 파일에만 기록)')
+    parser.add_argument('--output', default='backfill.jsonl',
+                        help='--backfill dry-run 결과 파일 (JSONL, 기본값: backfill.jsonl)')
+    parser.add_argument('--restart', action='store_true',
+                        help='--backfill 진행 상황을 무시하고 처음부터 다시')
     
     args = parser.parse_args()
     
@@ -431,6 +1070,32 @@ def main():
         logger.error("2. .env.example을 .env로 복사하고 실제 값으로 변경하세요.")
         return
     
+    # 백필: 지정한 범위만 처리하고 종료 (실시간 처리 체크포인트는 그대로)
+    if args.backfill:
+        if not os.path.exists(DB_PATH):
+            logger.error(f"❌ 쿨메신저 데이터베이스 파일을 찾을 수 없습니다: {DB_PATH}")
+            return
+        from backfill import run_backfill
+        run_backfill(DB_PATH, OPENAI_API_KEY, *args.backfill, commit=args.commit,
+                     output_path=args.output,
+                     progress_path=os.getenv('BACKFILL_PROGRESS_FILE', 'backfill_progress.json'),
+                     restart=args.restart)
+        return
+    
+    # 여러 메일함 모드: 감시/작업자 풀/요청 제한을 함께 쓰고 체크포인트는 메일함별로
+    if args.mailboxes:
+        from mailboxes import load_mailboxes, run_mailboxes
+        if args.engine != 'thread':
+            logger.warning("⚠️ 여러 메일함 모드는 thread 엔진만 지원합니다")
+        try:
+            profiles = load_mailboxes(args.mailboxes)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ 메일함 목록 파일 오류: {e}")
+            return
+        run_mailboxes(profiles, OPENAI_API_KEY, start_date=args.start_date,
+                      shards=args.shards, background=args.background)
+        return
+    
     if not os.path.exists(DB_PATH) and DB_PATH != '.UDB-LOCATION':
         logger.error(f"❌ 쿨메신저 데이터베이스 파일을 찾을 수 없습니다: {DB_PATH}")
         logger.error(".env 파일에서 UDB_PATH를 올바른 경로로 설정하세요.")
@@ -443,11 +1108,30 @@ def main():
         logger.info(f"📁 데이터베이스: {DB_PATH}")
         logger.info("-" * 50)
 
+    from watchdog.observers import Observer
+    from database_watcher import DatabaseWatcher
+    
     # 프로세서 초기화
-    processor = CoolMessengerProcessor(DB_PATH, OPENAI_API_KEY)
+    processor = CoolMessengerProcessor(DB_PATH, OPENAI_API_KEY, start_date=args.start_date)
+    metrics_exporter = create_metrics_exporter(processor.metrics).start()
     
-    # 파일 변경 감지 설정
-    event_handler = DatabaseWatcher(processor)
+    from scheduler import ProcessingScheduler
+    
+    policy = create_poll_policy(args.background)
+    debounce = float(os.getenv('PROCESS_DEBOUNCE_SECONDS', '0.5'))
+    max_delay = float(os.getenv('PROCESS_MAX_DELAY_SECONDS', '5'))
+    if args.engine == 'async':
+        from async_engine import AsyncEngine
+        engine = AsyncEngine(processor, OPENAI_API_KEY, policy=policy,
+                             workers=int(os.getenv('ANALYSIS_WORKERS', '4')),
+                             debounce=debounce)
+    else:
+        engine = ProcessingScheduler(processor.process_new_messages, policy=policy,
+                                     debounce=debounce, max_delay=max_delay,
+                                     change_probe=processor.reader.file_signature)
+    
+    # 파일 변경 감지 설정 (감지 스레드는 알림만 전달하고 처리는 엔진에서 합쳐서 실행)
+    event_handler = DatabaseWatcher(engine.notify, DB_PATH if os.path.exists(DB_PATH) else None)
     observer = Observer()
     
     # .udb 파일이 있는 디렉토리 감시
@@ -463,37 +1147,40 @@ def main():
         logger.info("🚀 쿨메신저 AI 자동화 프로그램 시작...")
         logger.info(f"👀 감시 디렉토리: {watch_dir}")
     
-    # 기존 메시지 처리 (처음 실행시)
-    processor.process_new_messages()
-    
     # 파일 감시 시작
     observer.start()
     
     # 시스템 트레이 실행 (백그라운드 모드)
-    if args.background and TRAY_AVAILABLE and not args.no_tray:
-        tray_app = SystemTrayApp(processor)
+    tray_app_class = load_tray_app() if args.background and not args.no_tray else None
+    if tray_app_class:
+        tray_app = tray_app_class(processor, on_command=engine.notify)
         tray_thread = threading.Thread(target=tray_app.run_tray, daemon=True)
         tray_thread.start()
         logger.info("📍 시스템 트레이에서 실행 중...")
     
     try:
-        if args.background:
-            # 백그라운드 모드: 무한 대기
-            while True:
-                time.sleep(300)  # 5분마다 체크
-                # 주기적으로 메시지 확인 (파일 감지 실패 대비)
-                processor.process_new_messages()
+        # 기존 메시지를 먼저 처리한 뒤 감지/주기 확인/트레이 명령 처리
+        if args.engine == 'async':
+            import asyncio
+            asyncio.run(engine.run())
         else:
-            # 일반 모드: 1분마다 체크
-            while True:
-                time.sleep(60)
-                processor.process_new_messages()
+            engine.run()
                 
     except KeyboardInterrupt:
-        observer.stop()
         if not args.background:
             logger.info("\n🛑 프로그램 종료")
     
+    observer.stop()
+    cache_stats = processor.analysis_cache.stats()
+    logger.info(f"⚡ 분석 캐시: 적중 {cache_stats['hits']}회, 실패 {cache_stats['misses']}회")
+    processor.log_normalizer_stats()
+    processor.log_router_stats()
+    processor.close()
+    metrics_exporter.close()
+    if args.engine == 'thread':
+        latency = engine.stats()
+        logger.info(f"⏱️ 처리 {latency['passes']}회 (합쳐진 요청 {latency['coalesced']}건), "
+                    f"지연 평균 {latency['latency_avg']:.2f}초 / 최대 {latency['latency_max']:.2f}초")
     observer.join()
 
 if __name__ == "__main__":
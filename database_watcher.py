@@ -0,0 +1,30 @@
+import os
+import logging
+from watchdog.events import FileSystemEventHandler
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWatcher(FileSystemEventHandler):
+    """데이터베이스 파일 변경 감지 (처리는 on_change를 받은 쪽에서 합쳐서 실행)
+
+    db_path를 지정하면 그 파일(과 WAL 파일)만 감지하므로, 같은 폴더에 있는
+    여러 메일함을 각각 구분할 수 있습니다.
+    """
+    def __init__(self, on_change, db_path=None):
+        self.on_change = on_change
+        self.db_path = os.path.normcase(os.path.abspath(db_path)) if db_path else None
+        
+    def on_modified(self, event):
+        if event.is_directory:
+            return
+            
+        # .udb 파일(과 WAL 파일)만 감지, watchdog 스레드는 막지 않고 알림만 전달
+        if not event.src_path.endswith(('.udb', '.udb-wal')):
+            return
+        if self.db_path:
+            path = os.path.normcase(os.path.abspath(event.src_path))
+            if path not in (self.db_path, self.db_path + '-wal'):
+                return
+        logger.debug(f"📝 데이터베이스 변경 감지: {event.src_path}")
+        self.on_change('watch')
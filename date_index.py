@@ -0,0 +1,131 @@
+import re
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 'YYYY-MM-DD', 'YYYY/MM/DD', 'YYYY.MM.DD' 형식의 앞부분만 사용
+DAY_PATTERN = re.compile(r'(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})')
+
+
+def normalize_day(value):
+    """ReceiveDate 값을 'YYYY-MM-DD' 문자열로 변환 (알 수 없으면 None)"""
+    if not value:
+        return None
+    match = DAY_PATTERN.match(str(value).strip())
+    if not match:
+        return None
+    year, month, day = match.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+class DateKeyIndex:
+    """날짜별 MessageKey 범위 색인
+
+    tbl_recv의 ReceiveDate를 함수로 감싸 조회하면 색인을 쓸 수 없어 전체를
+    훑게 됩니다. 대신 날짜별 (첫 키, 마지막 키)를 별도 파일에 저장해 두고,
+    실행할 때마다 마지막으로 색인한 키 이후의 행만 읽어 갱신합니다.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS day_index (
+        day TEXT PRIMARY KEY,
+        first_key INTEGER NOT NULL,
+        last_key INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS day_index_meta (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, reader, path='processing_state.db'):
+        self.reader = reader
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def _get_meta(self, name):
+        row = self._conn.execute(
+            "SELECT value FROM day_index_meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO day_index_meta (name, value) VALUES (?, ?)",
+            (name, str(value)))
+
+    def _reset(self):
+        self._conn.execute("DELETE FROM day_index")
+        self._conn.execute("DELETE FROM day_index_meta")
+
+    def refresh(self):
+        """마지막으로 색인한 키 이후의 메시지만 읽어 색인 갱신"""
+        with self._lock:
+            with self._conn:
+                db_path = self._get_meta('db_path')
+                indexed_through = int(self._get_meta('indexed_through') or 0)
+                max_key = self.reader.fetch_max_key() or 0
+
+                # 다른 .udb 파일이거나 파일이 새로 만들어졌으면 처음부터 다시 색인
+                if db_path != self.reader.db_path or max_key < indexed_through:
+                    if db_path is not None:
+                        logger.info("🔄 날짜 색인을 처음부터 다시 만듭니다")
+                    self._reset()
+                    self._set_meta('db_path', self.reader.db_path)
+                    indexed_through = 0
+
+                if max_key <= indexed_through:
+                    return 0
+
+                added = 0
+                for rows in self.reader.iter_key_dates(indexed_through):
+                    ranges = {}
+                    for message_key, receive_date in rows:
+                        day = normalize_day(receive_date)
+                        if day is None:
+                            continue
+                        first, last = ranges.get(day, (message_key, message_key))
+                        ranges[day] = (min(first, message_key), max(last, message_key))
+                    self._conn.executemany("""
+                        INSERT INTO day_index (day, first_key, last_key) VALUES (?, ?, ?)
+                        ON CONFLICT(day) DO UPDATE SET
+                            first_key = MIN(first_key, excluded.first_key),
+                            last_key = MAX(last_key, excluded.last_key)
+                    """, [(day, first, last) for day, (first, last) in ranges.items()])
+                    indexed_through = rows[-1][0]
+                    added += len(rows)
+
+                self._set_meta('indexed_through', indexed_through)
+            if added:
+                logger.info(f"📇 날짜 색인 갱신: {added:,}개 메시지")
+            return added
+
+    def first_key_on_or_after(self, day):
+        """해당 날짜(YYYY-MM-DD) 이후 첫 번째 메시지 키 (없으면 None)"""
+        normalized = normalize_day(day)
+        if normalized is None:
+            raise ValueError(f"날짜 형식이 올바르지 않습니다: {day}")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(first_key) FROM day_index WHERE day >= ?", (normalized,)).fetchone()
+        return row[0]
+
+    def last_key_on_or_before(self, day):
+        """해당 날짜(YYYY-MM-DD)까지의 마지막 메시지 키 (없으면 None)"""
+        normalized = normalize_day(day)
+        if normalized is None:
+            raise ValueError(f"날짜 형식이 올바르지 않습니다: {day}")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(last_key) FROM day_index WHERE day <= ?", (normalized,)).fetchone()
+        return row[0]
+
+    def close(self):
+        """연결 닫기"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,121 @@
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta
+from analysis_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def body_hash(body):
+    """요청 본문 비교용 해시"""
+    return hashlib.sha256(
+        json.dumps(body, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class DispatchIndex:
+    """Google에 추가한 일정/할일 색인 (중복 추가 방지)
+
+    (종류, 제목, 날짜, 시간, 발신자)를 정규화한 지문을 키로 Google ID를 저장합니다.
+    같은 지문이 다시 나오면 원격 목록을 조회하지 않고 로컬에서 바로 건너뛰거나
+    기존 항목을 수정합니다. 추가하기 전에 지문을 먼저 예약하므로, 파일 감지와
+    주기 확인이 동시에 같은 메시지를 처리해도 한쪽만 추가합니다.
+
+    같은 파일을 실행 중인 프로그램과 백필이 함께 쓰므로, 끝나지 않은 예약은
+    STALE_RESERVATION_SECONDS가 지난 것만 중간에 종료된 실행의 흔적으로 보고
+    정리하거나 이어받습니다.
+    """
+
+    # Google 요청 한 번(재시도 포함)보다 충분히 긴 시간
+    STALE_RESERVATION_SECONDS = 600
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS dispatched_items (
+        fingerprint TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        google_id TEXT,
+        message_key INTEGER,
+        body_hash TEXT,
+        updated_at TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path='processing_state.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+        # 예약만 하고 오래 끝나지 않은 항목은 이전 실행이 중간에 종료된 것이므로 정리
+        # (최근 예약은 다른 프로세스가 추가 중일 수 있으므로 남김)
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM dispatched_items WHERE google_id IS NULL AND updated_at < ?",
+                (self._stale_before(),))
+
+    def _stale_before(self):
+        """이 시각보다 오래된 예약은 끝나지 않은 것으로 봄"""
+        return (datetime.now() - timedelta(seconds=self.STALE_RESERVATION_SECONDS)).isoformat(timespec='seconds')
+
+    @staticmethod
+    def fingerprint(kind, analysis, sender):
+        """정규화한 (종류, 제목, 날짜, 시간, 발신자)의 SHA-256"""
+        parts = [
+            kind,
+            normalize_text(analysis.get('title')).lower(),
+            normalize_text(analysis.get('date') or analysis.get('deadline')),
+            normalize_text(analysis.get('time')),
+            normalize_text(sender).lower(),
+        ]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def reserve(self, fingerprint, kind, message_key, body):
+        """지문 예약 (새로 예약했으면 None, 이미 있으면 (google_id, body_hash))"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO dispatched_items "
+                "(fingerprint, kind, google_id, message_key, body_hash, updated_at) "
+                "VALUES (?, ?, NULL, ?, ?, ?)",
+                (fingerprint, kind, message_key, body_hash(body), now)).rowcount
+            if inserted:
+                return None
+            # 중간에 종료된 실행이 남긴 오래된 예약은 이어받음
+            taken = self._conn.execute(
+                "UPDATE dispatched_items SET message_key = ?, body_hash = ?, updated_at = ? "
+                "WHERE fingerprint = ? AND google_id IS NULL AND updated_at < ?",
+                (message_key, body_hash(body), now, fingerprint, self._stale_before())).rowcount
+            if taken:
+                return None
+            return self._conn.execute(
+                "SELECT google_id, body_hash FROM dispatched_items WHERE fingerprint = ?",
+                (fingerprint,)).fetchone()
+
+    def complete(self, fingerprint, google_id):
+        """추가가 끝난 항목의 Google ID 기록"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE dispatched_items SET google_id = ?, updated_at = ? WHERE fingerprint = ?",
+                (google_id, datetime.now().isoformat(timespec='seconds'), fingerprint))
+
+    def update_body(self, fingerprint, body):
+        """기존 항목을 수정한 뒤 본문 해시 갱신"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE dispatched_items SET body_hash = ?, updated_at = ? WHERE fingerprint = ?",
+                (body_hash(body), datetime.now().isoformat(timespec='seconds'), fingerprint))
+
+    def release(self, fingerprint):
+        """추가에 실패한 항목의 예약 취소"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM dispatched_items WHERE fingerprint = ? AND google_id IS NULL",
+                (fingerprint,))
+
+    def close(self):
+        """연결 닫기"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,170 @@
+import re
+from datetime import datetime, timedelta
+
+# 날짜 표현
+ISO_DATE = re.compile(r'(?<!\d)(\d{4})[-./](\d{1,2})[-./](\d{1,2})(?!\d)')
+KOREAN_DATE = re.compile(r'(?:(\d{4})\s*년\s*)?(\d{1,2})\s*월\s*(\d{1,2})\s*일')
+SLASH_DATE = re.compile(r'(?<![\d/.])(\d{1,2})/(\d{1,2})(?![\d/])')
+RELATIVE_DATE = re.compile(r'(오늘|금일|내일|명일|모레)')
+WEEKDAY_DATE = re.compile(r'(이번\s*주|금주|다음\s*주|차주)?\s*([월화수목금토일])요일')
+
+# "6/3"은 분수나 비율("1/2 이상")일 수도 있으므로 날짜라는 단서가 있을 때만 날짜로 봄
+SLASH_WEEKDAY = re.compile(r'\s*\(?\s*[월화수목금토일](?:요일)?\s*\)?')
+DATE_CONTEXT = re.compile(r'일시|날짜|일자|일정|기한|마감|까지')
+
+# 시간 표현 ("1시간"처럼 기간을 뜻하는 경우 제외)
+KOREAN_TIME = re.compile(r'(오전|오후|아침|저녁|밤|낮)?\s*(\d{1,2})\s*시(?!간)\s*(?:(\d{1,2})\s*분|(반))?')
+COLON_TIME = re.compile(r'(?<![\d:])(\d{1,2}):(\d{2})(?![\d:])')
+
+# 단순 회신/읽음 확인 메시지
+ACK_INFO = re.compile(r'^(네|넵|예)?[\s,.]*(확인\s*했습니다|확인\s*하였습니다|알겠습니다|감사합니다|수고\s*하셨습니다|잘\s*받았습니다|수신\s*확인|읽음)[\s.!~^]*$')
+ACK_TODO = re.compile(r'(확인\s*(바랍니다|부탁드립니다|해\s*주세요|해\s*주시기\s*바랍니다)|회신\s*(바랍니다|부탁드립니다|해\s*주세요))')
+
+RELATIVE_DAYS = {'오늘': 0, '금일': 0, '내일': 1, '명일': 1, '모레': 2}
+WEEKDAYS = '월화수목금토일'
+PM_MARKERS = ('오후', '저녁', '밤')
+
+CATEGORY_KEYWORDS = [
+    ('회의', ('회의', '협의회', '위원회', '연수')),
+    ('수업', ('수업', '시간표', '보강', '교시')),
+    ('행사', ('행사', '축제', '체육대회', '발표회', '졸업식', '입학식', '현장체험')),
+    ('과제', ('제출', '과제', '마감', '보고서')),
+]
+HIGH_PRIORITY_KEYWORDS = ('긴급', '필독', '중요', '엄수')
+DEADLINE_KEYWORDS = ('까지', '마감', '제출')
+
+
+def _safe_date(year, month, day):
+    try:
+        return datetime(int(year), int(month), int(day)).date()
+    except ValueError:
+        return None
+
+
+def _infer_year(month, day, today):
+    """연도가 없는 날짜는 올해로 보되, 한 달 이상 지났으면 내년으로 판단"""
+    date = _safe_date(today.year, month, day)
+    if date and date < today - timedelta(days=30):
+        date = _safe_date(today.year + 1, month, day)
+    return date
+
+
+def extract_dates(text, today):
+    """텍스트에서 날짜 후보 목록 추출"""
+    dates = []
+    consumed = []
+    for match in ISO_DATE.finditer(text):
+        dates.append(_safe_date(*match.groups()))
+        consumed.append(match.span())
+    for match in KOREAN_DATE.finditer(text):
+        year, month, day = match.groups()
+        dates.append(_safe_date(year, month, day) if year else _infer_year(month, day, today))
+    slash_context = bool(DATE_CONTEXT.search(text) or extract_times(text))
+    for match in SLASH_DATE.finditer(text):
+        if any(start <= match.start() < end for start, end in consumed):
+            continue
+        if not (slash_context or SLASH_WEEKDAY.match(text, match.end())):
+            continue
+        dates.append(_infer_year(*match.groups(), today))
+    for match in RELATIVE_DATE.finditer(text):
+        dates.append(today + timedelta(days=RELATIVE_DAYS[match.group(1)]))
+    for match in WEEKDAY_DATE.finditer(text):
+        week, weekday = match.groups()
+        target = WEEKDAYS.index(weekday)
+        if week and week.replace(' ', '') in ('다음주', '차주'):
+            monday = today - timedelta(days=today.weekday()) + timedelta(days=7)
+            dates.append(monday + timedelta(days=target))
+        elif week:
+            monday = today - timedelta(days=today.weekday())
+            dates.append(monday + timedelta(days=target))
+        else:
+            dates.append(today + timedelta(days=(target - today.weekday()) % 7))
+    return [date for date in dates if date is not None]
+
+
+def extract_times(text):
+    """텍스트에서 (시간 'HH:MM', 오전/오후가 모호한지) 후보 목록 추출"""
+    times = []
+    for match in KOREAN_TIME.finditer(text):
+        marker, hour, minute, half = match.groups()
+        hour = int(hour)
+        minute = 30 if half else int(minute or 0)
+        ambiguous = False
+        if marker in PM_MARKERS and hour < 12:
+            hour += 12
+        elif marker is None and 1 <= hour <= 6:
+            # 학교 일정에서 "2시"는 대부분 오후지만 확실하지 않음
+            hour += 12
+            ambiguous = True
+        if hour < 24 and minute < 60:
+            times.append((f"{hour:02d}:{minute:02d}", ambiguous))
+    for match in COLON_TIME.finditer(text):
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour < 24 and minute < 60:
+            times.append((f"{hour:02d}:{minute:02d}", False))
+    return times
+
+
+def _category(text):
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return '기타'
+
+
+def _result(kind, title, content, text, date=None, time=None, deadline=None):
+    """LLM 응답과 같은 형식의 분석 결과"""
+    if title:
+        summary = title
+    elif content.strip():
+        summary = content.strip().splitlines()[0]
+    else:
+        summary = '메시지'
+    return {
+        "type": kind,
+        "priority": "high" if any(k in text for k in HIGH_PRIORITY_KEYWORDS) else "medium",
+        "title": summary[:50],
+        "description": content[:200],
+        "date": date,
+        "time": time,
+        "deadline": deadline,
+        "category": _category(text),
+    }
+
+
+def classify(sender, title, content, today=None):
+    """규칙 기반 분류 결과와 신뢰도(0~1) 반환
+
+    확실한 경우(단순 회신, 날짜와 시간이 하나씩 분명한 일정)만 높은 신뢰도를
+    주고, 그 외에는 (None, 0.0)을 반환해 AI 분석으로 넘깁니다. 시간 없이
+    날짜만 있으면 기본 기준(0.85)보다 낮은 신뢰도를 주어 AI가 판단합니다.
+    """
+    today = today or datetime.now().date()
+    content = content or ''
+    text = f"{title or ''}\n{content}"
+    body = content.strip()
+
+    dates = sorted(set(extract_dates(text, today)))
+    times = extract_times(text)
+    distinct_times = sorted({value for value, _ in times})
+
+    if not dates and not times:
+        if ACK_INFO.match(body):
+            return _result('info', title, content, text), 0.95
+        if len(body) <= 60 and ACK_TODO.search(body):
+            return _result('todo', title, content, text), 0.9
+        return None, 0.0
+
+    # 날짜가 여러 개거나 시간이 여러 개면 AI가 판단
+    if len(dates) != 1 or len(distinct_times) > 1:
+        return None, 0.0
+
+    date = dates[0].strftime('%Y-%m-%d')
+    deadline = date if any(k in text for k in DEADLINE_KEYWORDS) else None
+    if not distinct_times:
+        return _result('calendar', title, content, text, date, '09:00', deadline), 0.75
+
+    time_value = distinct_times[0]
+    ambiguous = any(flag for value, flag in times if value == time_value)
+    confidence = 0.8 if ambiguous else 0.9
+    return _result('calendar', title, content, text, date, time_value, deadline), confidence
@@ -0,0 +1,225 @@
+import os
+import re
+import sqlite3
+import hashlib
+from itertools import groupby
+from collections import Counter
+from operator import itemgetter
+
+# 'YYYY-MM-DD HH:MM:SS,mmm - LEVEL - 메시지' (coolmessenger_auto.setup_logging 형식)
+RECORD_REST = rb':\d{2}:\d{2},\d{3} - ([A-Z]+) - '
+RECORD_PATTERN = re.compile(rb'(\d{4}-\d{2}-\d{2} \d{2})' + RECORD_REST)
+
+# 여러 줄을 한꺼번에 찾을 때는 ^ 대신 줄바꿈으로 줄 시작을 찾는 쪽이 훨씬 빠름
+LINE_RECORD_PATTERN = re.compile(b'\n' + RECORD_PATTERN.pattern)
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# 파일이 바뀌었는지 확인할 때 비교하는 앞부분 크기
+HEAD_SIZE = 1024
+
+# 색인을 갱신할 때 한 번에 읽는 크기
+READ_SIZE = 1024 * 1024
+
+
+def parse_record(line):
+    """로그 줄(bytes)에서 (시간 'YYYY-MM-DD HH', 레벨) 추출 (여러 줄 로그의 이어지는 줄이면 None)"""
+    match = RECORD_PATTERN.match(line)
+    if not match:
+        return None
+    return match.group(1).decode('ascii'), match.group(2).decode('ascii')
+
+
+class LogIndex:
+    """로그 파일의 시간대/레벨별 바이트 위치 색인
+
+    같은 시간(1시간 단위)이 이어지는 구간마다 (시작, 끝 위치, 레벨별 줄 수)를
+    로그 옆 파일(coolmessenger.log.idx)에 저장합니다. 실행할 때마다 마지막으로
+    색인한 위치 이후에 추가된 부분만 읽어 갱신하고, 로그가 비워지거나 다른
+    파일로 바뀌었으면 처음부터 다시 만듭니다. 트레이스백처럼 여러 줄인 로그는
+    앞 줄의 시간/레벨을 따릅니다.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS log_runs (
+        id INTEGER PRIMARY KEY,
+        hour TEXT,
+        start INTEGER NOT NULL,
+        end INTEGER NOT NULL,
+        debug INTEGER NOT NULL DEFAULT 0,
+        info INTEGER NOT NULL DEFAULT 0,
+        warning INTEGER NOT NULL DEFAULT 0,
+        error INTEGER NOT NULL DEFAULT 0,
+        critical INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_log_runs_hour ON log_runs (hour);
+    CREATE TABLE IF NOT EXISTS log_index_meta (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, log_path, index_path=None):
+        self.log_path = log_path
+        self.index_path = index_path or f"{log_path}.idx"
+        self._conn = sqlite3.connect(self.index_path)
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def _get_meta(self, name):
+        row = self._conn.execute(
+            "SELECT value FROM log_index_meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO log_index_meta (name, value) VALUES (?, ?)",
+            (name, '' if value is None else str(value)))
+
+    def _reset(self):
+        self._conn.execute("DELETE FROM log_runs")
+        self._conn.execute("DELETE FROM log_index_meta")
+
+    @staticmethod
+    def _head_hash(f, length):
+        f.seek(0)
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+    def refresh(self):
+        """마지막으로 색인한 위치 이후에 추가된 줄만 읽어 색인 갱신 (새로 색인한 바이트 수 반환)"""
+        with open(self.log_path, 'rb') as f, self._conn:
+            size = os.fstat(f.fileno()).st_size
+            indexed_size = int(self._get_meta('indexed_size') or 0)
+            head_length = int(self._get_meta('head_length') or 0)
+
+            # 로그가 비워졌거나(clear_old_logs) 다른 파일로 바뀌었으면 처음부터
+            if size < indexed_size or (
+                    head_length and self._head_hash(f, head_length) != self._get_meta('head_hash')):
+                self._reset()
+                indexed_size = head_length = 0
+            if size == indexed_size:
+                return 0
+
+            run = self._conn.execute(
+                "SELECT id, hour, start, end, debug, info, warning, error, critical "
+                "FROM log_runs ORDER BY id DESC LIMIT 1").fetchone()
+            run = list(run) if run else None
+
+            f.seek(indexed_size)
+            position = indexed_size
+            pending = b''
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                data = pending + chunk
+                # 아직 줄바꿈이 없는 마지막 줄은 다음 갱신 때 색인
+                cut = data.rfind(b'\n') + 1
+                data, pending = data[:cut], data[cut:]
+                if not data:
+                    continue
+                if run is None:
+                    # 파일 맨 앞의 시간 없는 줄 (정리 안내 등)
+                    run = [None, None, position, position, 0, 0, 0, 0, 0]
+                # 줄마다 반복하지 않도록 로그 시작 줄을 한꺼번에 찾아 시간별로 묶어 셈
+                # (이어지는 줄은 앞 구간에 포함)
+                # 앞에 줄바꿈을 붙여 찾으므로 찾은 위치가 곧 data 안의 줄 시작 위치
+                lines = b'\n' + data
+                search_from = 0
+                for hour, records in groupby(LINE_RECORD_PATTERN.findall(lines), key=itemgetter(0)):
+                    counts = Counter(map(itemgetter(1), records))
+                    hour_text = hour.decode('ascii')
+                    if run[1] != hour_text:
+                        # 시간이 바뀐 첫 줄의 위치
+                        match = re.compile(b'\n' + re.escape(hour) + RECORD_REST).search(lines, search_from)
+                        search_from = match.end()
+                        run[3] = position + match.start()
+                        if run[3] > run[2]:
+                            self._save_run(run)
+                        run = [None, hour_text, run[3], run[3], 0, 0, 0, 0, 0]
+                    for level, count in counts.items():
+                        level = level.decode('ascii')
+                        if level in LEVELS:
+                            run[4 + LEVELS.index(level)] += count
+                position += len(data)
+                run[3] = position
+            self._save_run(run)
+
+            if not head_length:
+                head_length = min(size, HEAD_SIZE)
+                self._set_meta('head_length', head_length)
+                self._set_meta('head_hash', self._head_hash(f, head_length))
+            self._set_meta('indexed_size', position)
+            return position - indexed_size
+
+    def _save_run(self, run):
+        if run is None:
+            return
+        if run[0] is None:
+            cursor = self._conn.execute(
+                "INSERT INTO log_runs (hour, start, end, debug, info, warning, error, critical) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", run[1:])
+            run[0] = cursor.lastrowid
+        else:
+            self._conn.execute(
+                "UPDATE log_runs SET end = ?, debug = ?, info = ?, warning = ?, error = ?, critical = ? "
+                "WHERE id = ?", run[3:] + run[:1])
+
+    def find_ranges(self, level=None, date=None):
+        """level/date(앞부분, 예: '2025-05-01' 또는 '2025-05-01 13')에 해당하는 (시작, 끝) 위치 목록
+
+        붙어 있는 구간은 하나로 합치며, 색인 뒤에 아직 색인하지 않은 부분이
+        있으면 그 부분도 포함합니다.
+        """
+        query = "SELECT start, end FROM log_runs WHERE 1 = 1"
+        params = []
+        if date:
+            # 시간 단위까지만 색인하므로 분 이하는 읽으면서 확인
+            query += " AND substr(hour, 1, ?) = ?"
+            prefix = date[:13]
+            params += [len(prefix), prefix]
+        if level:
+            level = level.upper()
+            if level not in LEVELS:
+                return []
+            query += f" AND {level.lower()} > 0"
+        query += " ORDER BY start"
+
+        ranges = []
+        for start, end in self._conn.execute(query, params):
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+
+        indexed_size = int(self._get_meta('indexed_size') or 0)
+        size = os.path.getsize(self.log_path)
+        if size > indexed_size:
+            # 이어지는 줄일 수 있으므로 마지막 구간부터 읽어 앞 줄의 시간/레벨을 알아냄
+            last = self._conn.execute("SELECT MAX(start) FROM log_runs").fetchone()[0]
+            tail_start = indexed_size if last is None else last
+            while ranges and ranges[-1][1] >= tail_start:
+                tail_start = min(tail_start, ranges.pop()[0])
+            ranges.append([tail_start, size])
+        return [tuple(r) for r in ranges]
+
+
+def iter_records(f, ranges):
+    """ranges 구간의 줄을 (시간, 레벨, 줄) 형태로 읽기 (이어지는 줄은 앞 줄의 시간/레벨)"""
+    for start, end in ranges:
+        f.seek(start)
+        timestamp = level = None
+        remaining = end - start
+        while remaining > 0:
+            line = f.readline(remaining)
+            if not line:
+                break
+            remaining -= len(line)
+            record = parse_record(line)
+            if record is not None:
+                level = record[1]
+                timestamp = line[:19].decode('ascii')
+            yield timestamp, level, line.decode('utf-8', errors='replace')
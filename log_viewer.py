@@ -6,17 +6,45 @@ CoolMessenger 로그 뷰어
 """
 
 import os
-import sys
-import time
+import re
+import sqlite3
+import threading
 import argparse
-from datetime import datetime, timedelta
+from datetime import datetime
+
+# 뒤에서부터 읽을 때 한 번에 읽는 크기
+TAIL_BLOCK_SIZE = 64 * 1024
 
 def tail_log(filename, lines=50):
-    """로그 파일의 마지막 N줄을 출력"""
+    """로그 파일의 마지막 N줄을 출력
+    
+    파일 끝에서부터 블록 단위로 거꾸로 읽어 필요한 만큼만 읽습니다.
+    줄바꿈(0x0A)은 UTF-8 여러 바이트 문자 안에 나타나지 않으므로 바이트로
+    줄을 나눈 뒤 마지막 N줄만 디코딩합니다.
+    """
+    if lines <= 0:
+        return []
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
-            return all_lines[-lines:] if len(all_lines) > lines else all_lines
+        with open(filename, 'rb') as f:
+            f.seek(0, 2)
+            position = f.tell()
+            chunks = []
+            newlines = 0
+            # 마지막 줄이 줄바꿈으로 끝나면 그 줄바꿈은 세지 않음
+            if position:
+                f.seek(position - 1)
+                if f.read(1) == b'\n':
+                    newlines = -1
+            while position > 0 and newlines < lines:
+                size = min(TAIL_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                chunk = f.read(size)
+                chunks.append(chunk)
+                newlines += chunk.count(b'\n')
+        data = b''.join(reversed(chunks))
+        tail = data.splitlines(keepends=True)[-lines:]
+        return [line.decode('utf-8', errors='replace') for line in tail]
     except FileNotFoundError:
         print(f"❌ 로그 파일을 찾을 수 없습니다: {filename}")
         return []
@@ -24,22 +52,138 @@ def tail_log(filename, lines=50):
         print(f"❌ 로그 파일 읽기 오류: {e}")
         return []
 
-def follow_log(filename):
-    """실시간으로 로그 파일을 모니터링"""
+# 파일 변경 알림을 받지 못해도 이 간격(초)마다 확인 (watchdog이 없으면 이 간격으로 폴링)
+FOLLOW_CHECK_INTERVAL = 1.0
+FOLLOW_POLL_INTERVAL = 0.2
+
+# 파일이 비워지거나 바뀌었는지 확인할 때 비교하는 앞부분 크기
+FOLLOW_HEAD_SIZE = 256
+
+def _start_log_observer(filename, on_change):
+    """로그 파일 변경 알림(watchdog) 시작, 사용할 수 없으면 None"""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            # 파일 끝으로 이동
-            f.seek(0, 2)
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+    
+    target = os.path.normcase(os.path.abspath(filename))
+    
+    class LogFileHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            # 이름 변경(로테이션)은 원래 이름과 새 이름 중 하나라도 로그 파일이면 알림
+            paths = (event.src_path, getattr(event, 'dest_path', '') or '')
+            if any(path and os.path.normcase(os.path.abspath(path)) == target for path in paths):
+                on_change()
+    
+    try:
+        observer = Observer()
+        observer.schedule(LogFileHandler(), os.path.dirname(target), recursive=False)
+        observer.start()
+        return observer
+    except Exception as e:
+        print(f"⚠️ 파일 변경 알림을 사용할 수 없어 주기적으로 확인합니다: {e}")
+        return None
+
+def follow_log(filename, level=None, keyword=None):
+    """실시간으로 로그 파일을 모니터링
+    
+    watchdog 파일 변경 알림이 오면 새 줄을 읽고, 알림을 쓸 수 없으면 짧은
+    간격으로 확인합니다. 로그가 비워지거나(--clear) 다른 파일로 바뀌면
+    (로테이션) 다시 열어 처음부터 이어서 보여 줍니다. level/keyword를 주면
+    해당하는 줄만 출력합니다 (트레이스백처럼 이어지는 줄은 앞 줄의 레벨을 따름).
+    """
+    from log_index import parse_record
+    level = level.upper() if level else None
+    keyword = keyword.lower() if keyword else None
+    changed = threading.Event()
+    observer = None
+    f = None
+    
+    def open_log(at_end):
+        handle = open(filename, 'rb')
+        if at_end:
+            handle.seek(0, 2)
+        return handle, os.fstat(handle.fileno())
+    
+    def read_head(handle):
+        position = handle.tell()
+        handle.seek(0)
+        head = handle.read(FOLLOW_HEAD_SIZE)
+        handle.seek(position)
+        return head
+    
+    pending = b''
+    current_level = None
+    
+    def emit(data):
+        """새로 읽은 부분을 줄 단위로 필터링해 출력 (줄바꿈이 아직 없는 마지막 줄은 다음에)"""
+        nonlocal pending, current_level
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            record = parse_record(line)
+            if record is not None:
+                current_level = record[1]
+            if level and current_level != level:
+                continue
+            text = line.decode('utf-8', errors='replace').rstrip()
+            if keyword and keyword not in text.lower():
+                continue
+            print(text, flush=True)
+    
+    try:
+        f, opened = open_log(at_end=True)
+        head = read_head(f)
+        
+        observer = _start_log_observer(filename, changed.set)
+        interval = FOLLOW_CHECK_INTERVAL if observer else FOLLOW_POLL_INTERVAL
+        
+        print(f"📊 실시간 로그 모니터링 시작: {filename}")
+        if level or keyword:
+            print(f"🔍 필터: 레벨={level or '전체'}, 키워드={keyword or '없음'}")
+        if not observer:
+            print(f"⏱️ 파일 변경 알림 없이 {interval}초마다 확인합니다")
+        print("Ctrl+C로 종료하세요.\n")
+        
+        while True:
+            data = f.read()
+            if data:
+                emit(data)
+                if len(head) < FOLLOW_HEAD_SIZE:
+                    head = read_head(f)
             
-            print(f"📊 실시간 로그 모니터링 시작: {filename}")
-            print("Ctrl+C로 종료하세요.\n")
+            # 로테이션(다른 파일로 교체)이나 비우기(--clear) 확인
+            try:
+                current = os.stat(filename)
+            except FileNotFoundError:
+                # 로테이션 중 새 파일이 아직 없음
+                current = None
+            if current is not None:
+                if (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+                    # 예전 파일에 남은 줄을 마저 출력하고 새 파일을 처음부터
+                    emit(f.read())
+                    if pending:
+                        emit(b'\n')
+                    f.close()
+                    print("🔄 로그 파일이 교체되어 새 파일을 엽니다", flush=True)
+                    f, opened = open_log(at_end=False)
+                    head = read_head(f)
+                    current_level = None
+                    continue
+                new_head = read_head(f)
+                if current.st_size < f.tell() or new_head[:len(head)] != head[:len(new_head)]:
+                    print("🔄 로그 파일이 비워져 처음부터 다시 읽습니다", flush=True)
+                    f.seek(0)
+                    head = new_head
+                    pending = b''
+                    current_level = None
+                    continue
             
-            while True:
-                line = f.readline()
-                if line:
-                    print(line.rstrip())
-                else:
-                    time.sleep(0.1)
+            changed.wait(interval)
+            changed.clear()
                     
     except FileNotFoundError:
         print(f"❌ 로그 파일을 찾을 수 없습니다: {filename}")
@@ -47,31 +191,71 @@ def follow_log(filename):
         print("\n📊 실시간 모니터링 종료")
     except Exception as e:
         print(f"❌ 로그 모니터링 오류: {e}")
+    finally:
+        if observer:
+            observer.stop()
+            observer.join()
+        if f:
+            f.close()
+
+# --date로 받을 수 있는 형식 (YYYY-MM-DD, 또는 그 앞부분/뒤에 시:분까지)
+DATE_FILTER_PATTERN = re.compile(r'^\d{4}(-\d{2}(-\d{2}( \d{2}(:\d{2})?)?)?)?$')
+
+def find_log_ranges(filename, level=None, date=None):
+    """시간/레벨 색인(coolmessenger.log.idx)을 갱신하고 읽어야 할 (시작, 끝) 위치 목록 반환
+    
+    색인을 쓸 수 없으면 None (파일 전체를 읽음)
+    """
+    from log_index import LogIndex
+    if not os.path.exists(filename):
+        return None
+    try:
+        index = LogIndex(filename)
+        try:
+            index.refresh()
+            return index.find_ranges(level, date)
+        finally:
+            index.close()
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ 로그 색인을 사용할 수 없어 전체를 검색합니다: {e}")
+        return None
 
 def filter_logs(filename, level=None, date=None, keyword=None):
-    """로그를 필터링하여 출력"""
+    """로그를 필터링하여 출력
+    
+    레벨과 날짜는 각 로그 줄의 시간/레벨 칸으로 비교하고(메시지 안의 "INFO"는
+    무시), 색인으로 해당하는 구간만 찾아 읽습니다. 트레이스백처럼 여러 줄인
+    로그는 앞 줄의 시간/레벨을 따릅니다.
+    """
+    from log_index import iter_records
+    if date and not DATE_FILTER_PATTERN.match(date):
+        print(f"❌ 날짜 형식이 올바르지 않습니다 (YYYY-MM-DD): {date}")
+        return []
+    level = level.upper() if level else None
+    keyword = keyword.lower() if keyword else None
+    
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        filtered_lines = []
+        ranges = find_log_ranges(filename, level, date) if (level or date) else None
         
-        for line in lines:
-            # 레벨 필터
-            if level and level.upper() not in line:
-                continue
+        filtered_lines = []
+        with open(filename, 'rb') as f:
+            if ranges is None:
+                ranges = [(0, os.fstat(f.fileno()).st_size)]
                 
-            # 날짜 필터
-            if date:
-                if date not in line:
+            for timestamp, line_level, line in iter_records(f, ranges):
+                # 레벨 필터
+                if level and line_level != level:
+                    continue
+                    
+                # 날짜 필터
+                if date and not (timestamp and timestamp.startswith(date)):
                     continue
                     
-            # 키워드 필터
-            if keyword:
-                if keyword.lower() not in line.lower():
+                # 키워드 필터
+                if keyword and keyword not in line.lower():
                     continue
                     
-            filtered_lines.append(line.rstrip())
+                filtered_lines.append(line.rstrip())
             
         return filtered_lines
         
@@ -83,15 +267,27 @@ def filter_logs(filename, level=None, date=None, keyword=None):
         return []
 
 def show_log_stats(filename):
-    """로그 파일 통계 정보 출력"""
+    """로그 파일 통계 정보 출력 (파일을 한 번만 줄 단위로 읽어 크기와 관계없이 메모리 일정)"""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        total_lines = len(lines)
-        info_count = sum(1 for line in lines if 'INFO' in line)
-        error_count = sum(1 for line in lines if 'ERROR' in line)
-        warning_count = sum(1 for line in lines if 'WARNING' in line)
+        total_lines = 0
+        info_count = 0
+        error_count = 0
+        warning_count = 0
+        first_line = None
+        last_line = None
+        
+        with open(filename, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                total_lines += 1
+                if 'INFO' in line:
+                    info_count += 1
+                if 'ERROR' in line:
+                    error_count += 1
+                if 'WARNING' in line:
+                    warning_count += 1
+                if first_line is None:
+                    first_line = line
+                last_line = line
         
         file_size = os.path.getsize(filename)
         file_size_mb = file_size / (1024 * 1024)
@@ -103,9 +299,9 @@ def show_log_stats(filename):
         print(f"⚠️  WARNING: {warning_count:,}")
         print(f"❌ ERROR: {error_count:,}")
         
-        if lines:
-            first_line = lines[0].strip()
-            last_line = lines[-1].strip()
+        if first_line is not None:
+            first_line = first_line.strip()
+            last_line = last_line.strip()
             
             # 첫 번째와 마지막 로그의 시간 추출 시도
             try:
@@ -153,10 +349,10 @@ def main():
     parser.add_argument('--tail', '-t', type=int, default=50,
                        help='마지막 N줄 출력 (기본값: 50)')
     parser.add_argument('--follow', action='store_true',
-                       help='실시간 로그 모니터링')
+                       help='실시간 로그 모니터링 (--level, --keyword로 필터링 가능)')
     parser.add_argument('--level', choices=['INFO', 'WARNING', 'ERROR'],
                        help='로그 레벨 필터')
-    parser.add_argument('--date', help='날짜 필터 (YYYY-MM-DD 형식)')
+    parser.add_argument('--date', help='날짜 필터 (YYYY-MM-DD 형식, "YYYY-MM-DD HH"처럼 시간까지도 가능)')
     parser.add_argument('--keyword', '-k', help='키워드 필터')
     parser.add_argument('--stats', action='store_true',
                        help='로그 파일 통계 출력')
@@ -183,7 +379,7 @@ def main():
         return
         
     if args.follow:
-        follow_log(log_file)
+        follow_log(log_file, args.level, args.keyword)
         return
         
     # 필터링 또는 tail 출력
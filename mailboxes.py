@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def load_mailboxes(path):
+    """메일함 목록 파일(JSON) 읽기
+
+    {"mailboxes": [{"name": "hong", "udb_path": "...", "google_credentials": "...",
+    "google_token": "...", "state_db": "..."}]} 형식이며 udb_path만 필수입니다.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get('mailboxes', []) if isinstance(data, dict) else data
+
+    profiles = []
+    names = set()
+    for index, entry in enumerate(entries, 1):
+        if not entry.get('udb_path'):
+            raise ValueError(f"{index}번째 메일함에 udb_path가 없습니다")
+        name = entry.get('name') or os.path.splitext(os.path.basename(entry['udb_path']))[0]
+        if name in names:
+            raise ValueError(f"메일함 이름이 중복됩니다: {name}")
+        names.add(name)
+        profiles.append({
+            'name': name,
+            'udb_path': entry['udb_path'],
+            'google_credentials': entry.get('google_credentials'),
+            'google_token': entry.get('google_token', f'token_{name}.pickle'),
+            'state_db': entry.get('state_db', f'processing_state_{name}.db'),
+        })
+    return profiles
+
+
+class MailboxDaemon:
+    """여러 메일함(.udb)을 한 프로세스에서 처리하는 데몬
+
+    모든 메일함 폴더를 Observer 하나로 감시하고, AI 분석 작업자 풀과 요청
+    제한기, 분석 캐시, 단계별 지표는 함께 사용합니다. 체크포인트(상태 DB)와 Google 인증은
+    메일함마다 따로 둡니다. 메일함마다 스케줄러 스레드가 있어 같은 메일함은
+    한 번에 하나씩, 서로 다른 메일함은 동시에 처리됩니다.
+    """
+
+    def __init__(self, profiles, openai_api_key, start_date=None, shares=1, background=False,
+                 shard=None):
+        from coolmessenger_auto import (CoolMessengerProcessor, create_openai_client,
+                                        create_rate_limiter, create_analysis_cache,
+                                        create_poll_policy, create_metrics_exporter)
+        from scheduler import ProcessingScheduler
+        from metrics import StageMetrics
+
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv('ANALYSIS_WORKERS', '4')),
+                                           thread_name_prefix='analysis')
+        self.openai_client = create_openai_client(openai_api_key)
+        self.rate_limiter = create_rate_limiter(shares)
+        self.analysis_cache = create_analysis_cache()
+        self.metrics = StageMetrics()
+        self.metrics_exporter = create_metrics_exporter(self.metrics, shard)
+        debounce = float(os.getenv('PROCESS_DEBOUNCE_SECONDS', '0.5'))
+        max_delay = float(os.getenv('PROCESS_MAX_DELAY_SECONDS', '5'))
+
+        self.mailboxes = []
+        for profile in profiles:
+            processor = CoolMessengerProcessor(
+                profile['udb_path'], openai_api_key, start_date=start_date,
+                state_db_path=profile['state_db'],
+                google_credentials_file=profile['google_credentials'],
+                google_token_file=profile['google_token'],
+                legacy_checkpoint_file=None,
+                openai_client=self.openai_client,
+                rate_limiter=self.rate_limiter,
+                analysis_cache=self.analysis_cache,
+                executor=self.executor,
+                metrics=self.metrics
+            )
+            scheduler = ProcessingScheduler(
+                processor.process_new_messages, policy=create_poll_policy(background),
+                debounce=debounce, max_delay=max_delay, change_probe=processor.reader.file_signature,
+                name=profile['name'])
+            self.mailboxes.append((profile['name'], processor, scheduler))
+            logger.info(f"📬 [{profile['name']}] {profile['udb_path']}")
+
+    def run(self):
+        """Ctrl+C를 누를 때까지 모든 메일함 처리"""
+        from watchdog.observers import Observer
+        from database_watcher import DatabaseWatcher
+
+        # 같은 폴더는 감시 하나를 공유하고, 메일함별 감지기가 자기 파일만 골라냄
+        observer = Observer()
+        for name, processor, scheduler in self.mailboxes:
+            watch_dir = os.path.dirname(os.path.abspath(processor.db_path))
+            observer.schedule(DatabaseWatcher(scheduler.notify, processor.db_path),
+                              watch_dir, recursive=False)
+        observer.start()
+        self.metrics_exporter.start()
+
+        threads = []
+        for name, processor, scheduler in self.mailboxes:
+            thread = threading.Thread(target=scheduler.run, name=f'mailbox-{name}', daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("\n🛑 프로그램 종료")
+        finally:
+            for name, processor, scheduler in self.mailboxes:
+                scheduler.notify('quit')
+            for thread in threads:
+                thread.join()
+            observer.stop()
+            observer.join()
+            self.close()
+
+    def close(self):
+        """메일함별 저장소와 공유 자원 정리"""
+        for name, processor, scheduler in self.mailboxes:
+            stats = scheduler.stats()
+            logger.info(f"⏱️ [{name}] 처리 {stats['passes']}회, "
+                        f"지연 평균 {stats['latency_avg']:.2f}초 / 최대 {stats['latency_max']:.2f}초")
+            processor.log_normalizer_stats(f"[{name}] ")
+            processor.log_router_stats(f"[{name}] ")
+            processor.close()
+        self.executor.shutdown(wait=True)
+        cache_stats = self.analysis_cache.stats()
+        logger.info(f"⚡ 분석 캐시: 적중 {cache_stats['hits']}회, 실패 {cache_stats['misses']}회")
+        self.analysis_cache.close()
+        self.metrics_exporter.close()
+
+
+def _run_shard(profiles, openai_api_key, start_date, shares, background, shard):
+    """작업 프로세스 하나에서 메일함 일부 처리"""
+    MailboxDaemon(profiles, openai_api_key, start_date=start_date,
+                  shares=shares, background=background, shard=shard).run()
+
+
+def run_mailboxes(profiles, openai_api_key, start_date=None, shards=1, background=False):
+    """load_mailboxes로 읽은 메일함들을 처리 (shards > 1이면 여러 프로세스로 나눔)"""
+    if not profiles:
+        logger.error("❌ 메일함 목록이 비어 있습니다")
+        return
+    for profile in profiles:
+        if not os.path.exists(profile['udb_path']):
+            logger.error(f"❌ [{profile['name']}] 데이터베이스 파일을 찾을 수 없습니다: {profile['udb_path']}")
+            return
+
+    shards = max(1, min(shards, len(profiles)))
+    logger.info(f"📬 메일함 {len(profiles)}개를 프로세스 {shards}개에서 처리합니다")
+    if shards == 1:
+        MailboxDaemon(profiles, openai_api_key, start_date=start_date,
+                      background=background).run()
+        return
+
+    # 작업 프로세스에서는 브라우저 로그인 입력을 받을 수 없으므로 토큰이 미리 있어야 함
+    for profile in profiles:
+        if not os.path.exists(profile['google_token']):
+            logger.warning(f"⚠️ [{profile['name']}] Google 토큰({profile['google_token']})이 없습니다. "
+                           "먼저 --shards 없이 실행해서 로그인하세요")
+
+    # 요청 제한(OPENAI_RPM/TPM)은 프로세스 수로 나눠서 전체 한도를 지킴
+    groups = [profiles[index::shards] for index in range(shards)]
+    processes = [
+        multiprocessing.Process(target=_run_shard, name=f'mailbox-shard-{index}',
+                                args=(group, openai_api_key, start_date, shards, background, index))
+        for index, group in enumerate(groups)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C는 작업 프로세스에도 전달되므로 정리할 시간을 준 뒤 종료
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
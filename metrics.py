@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 단계별 지연 시간 히스토그램 구간 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 단계 이름: check(새 메시지 확인), fetch(SQLite 묶음 조회), rate_limit(OpenAI 요청 제한 대기),
+# openai(OpenAI 요청), analyze(규칙/캐시/AI 분석 전체), google(Google API 요청),
+# dispatch(전송과 체크포인트 갱신), pass(처리 한 번 전체)
+METRIC_PREFIX = 'coolmessenger'
+
+
+def _format_value(value):
+    """Prometheus 텍스트 형식 숫자"""
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class StageMetrics:
+    """단계별 지연 시간, 대기열 길이, 처리량, 오류 수 집계
+
+    여러 스레드(작업자 풀, 스케줄러)와 이벤트 루프에서 함께 기록하므로
+    잠금으로 보호합니다. 기록은 숫자 몇 개를 더하는 정도라 처리 속도에
+    영향을 주지 않습니다.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, rate_window=60):
+        self.buckets = tuple(sorted(buckets))
+        self.rate_window = rate_window
+        self.started = time.time()
+        self._histograms = {}  # 단계: [구간별 개수..., 합계, 개수]
+        self._max = {}
+        self._errors = {}
+        self._gauges = {}
+        self._processed_total = 0
+        self._recent = deque()  # (시각, 처리한 수) - 분당 처리량 계산용
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """단계 하나의 소요 시간 기록"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[index] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            self._max[stage] = max(self._max.get(stage, 0.0), seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """with 블록의 소요 시간을 기록 (예외가 나면 오류 수도 올림)"""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.error(stage)
+            raise
+        finally:
+            self.observe(stage, time.monotonic() - started)
+
+    def error(self, stage, amount=1):
+        """단계별 오류 수 증가"""
+        with self._lock:
+            self._errors[stage] = self._errors.get(stage, 0) + amount
+
+    def set_gauge(self, name, value):
+        """대기열 길이 같은 현재 값 기록"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def processed(self, count=1):
+        """처리 완료한 메시지 수 증가"""
+        now = time.monotonic()
+        with self._lock:
+            self._processed_total += count
+            self._recent.append((now, count))
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._recent and self._recent[0][0] < now - self.rate_window:
+            self._recent.popleft()
+
+    def messages_per_minute(self):
+        """최근 rate_window초 동안 처리한 메시지 수를 분당으로 환산"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            count = sum(amount for _, amount in self._recent)
+        return count * 60.0 / self.rate_window
+
+    def snapshot(self):
+        """현재 값 전체를 JSON으로 저장할 수 있는 dict로 반환"""
+        per_minute = self.messages_per_minute()
+        with self._lock:
+            stages = {}
+            for stage, histogram in self._histograms.items():
+                count = histogram[-1]
+                cumulative = 0
+                buckets = {}
+                for bound, amount in zip(self.buckets, histogram):
+                    cumulative += amount
+                    buckets[str(bound)] = cumulative
+                stages[stage] = {
+                    'count': count,
+                    'sum': histogram[-2],
+                    'avg': histogram[-2] / count if count else 0.0,
+                    'p50': self._quantile(stage, histogram, 0.5),
+                    'p99': self._quantile(stage, histogram, 0.99),
+                    'max': self._max[stage],
+                    'buckets': buckets,
+                }
+            return {
+                'timestamp': time.time(),
+                'uptime_seconds': time.time() - self.started,
+                'messages_processed': self._processed_total,
+                'messages_per_minute': per_minute,
+                'stages': stages,
+                'errors': dict(self._errors),
+                'gauges': dict(self._gauges),
+            }
+
+    def _quantile(self, stage, histogram, q):
+        """히스토그램 구간으로 추정한 분위수 (해당 구간의 상한, 마지막 구간을 넘으면 최댓값)"""
+        count = histogram[-1]
+        if not count:
+            return 0.0
+        target = q * count
+        cumulative = 0
+        for bound, amount in zip(self.buckets, histogram):
+            cumulative += amount
+            if cumulative >= target:
+                return min(bound, self._max[stage])
+        return self._max[stage]
+
+    def render_prometheus(self):
+        """Prometheus 텍스트 형식 (text/plain; version=0.0.4)"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds 처리 단계별 소요 시간",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        for stage, data in sorted(snapshot['stages'].items()):
+            for bound, cumulative in data['buckets'].items():
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {data["count"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {_format_value(data["sum"])}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_errors_total 처리 단계별 오류 수",
+            f"# TYPE {METRIC_PREFIX}_errors_total counter",
+        ]
+        for stage, count in sorted(snapshot['errors'].items()):
+            lines.append(f'{METRIC_PREFIX}_errors_total{{stage="{stage}"}} {count}')
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_queue_depth 단계 사이 대기열 길이",
+            f"# TYPE {METRIC_PREFIX}_queue_depth gauge",
+        ]
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f'{METRIC_PREFIX}_queue_depth{{queue="{name}"}} {_format_value(value)}')
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_messages_processed_total 처리 완료한 메시지 수",
+            f"# TYPE {METRIC_PREFIX}_messages_processed_total counter",
+            f"{METRIC_PREFIX}_messages_processed_total {snapshot['messages_processed']}",
+            f"# HELP {METRIC_PREFIX}_messages_per_minute 최근 1분 처리량",
+            f"# TYPE {METRIC_PREFIX}_messages_per_minute gauge",
+            f"{METRIC_PREFIX}_messages_per_minute {_format_value(snapshot['messages_per_minute'])}",
+            f"# HELP {METRIC_PREFIX}_uptime_seconds 실행 시간",
+            f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+            f"{METRIC_PREFIX}_uptime_seconds {_format_value(snapshot['uptime_seconds'])}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self, path):
+        """JSON 스냅샷 파일 저장 (임시 파일에 쓴 뒤 교체하므로 읽는 쪽이 반쯤 쓴 파일을 보지 않음)"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+
+class MetricsExporter:
+    """StageMetrics를 로컬 HTTP(/metrics, /metrics.json)와 JSON 스냅샷 파일로 내보내기
+
+    port가 없으면 HTTP 서버를, snapshot_path가 없으면 스냅샷 파일을 만들지 않습니다.
+    HTTP 서버는 기본적으로 127.0.0.1에만 열어 외부에서 접근할 수 없습니다.
+    """
+
+    def __init__(self, metrics, port=None, host='127.0.0.1', snapshot_path=None, interval=30):
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self._server = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        """HTTP 서버와 스냅샷 저장 스레드 시작"""
+        if self.port:
+            try:
+                self._start_server()
+            except OSError as e:
+                logger.warning(f"⚠️ 지표 서버를 열 수 없습니다 ({self.host}:{self.port}): {e}")
+        if self.snapshot_path:
+            thread = threading.Thread(target=self._snapshot_loop, name='metrics-snapshot', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _start_server(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = metrics.render_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 수집기가 자주 요청하므로 접근 로그는 남기지 않음
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logger.info(f"📊 지표: http://{self.host}:{self.port}/metrics")
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.interval):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        try:
+            self.metrics.write_snapshot(self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"⚠️ 지표 스냅샷 저장 실패: {e}")
+
+    def close(self):
+        """서버를 닫고 마지막 스냅샷 저장"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.snapshot_path:
+            self._write_snapshot()
@@ -0,0 +1,191 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 분석 결과 JSON 스키마 (구조화된 출력 모드로 형식을 보장)
+ANALYSIS_PROPERTIES = {
+    "type": {"type": "string", "enum": ["calendar", "todo", "info"]},
+    "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+    "title": {"type": "string"},
+    "description": {"type": "string"},
+    "date": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+    "time": {"type": ["string", "null"], "description": "HH:MM"},
+    "deadline": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+    "category": {"type": "string"},
+    "confidence": {"type": "number", "description": "분류 결과를 얼마나 확신하는지 (0~1)"},
+}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": ANALYSIS_PROPERTIES,
+    "required": list(ANALYSIS_PROPERTIES),
+    "additionalProperties": False,
+}
+
+BATCH_ITEM_PROPERTIES = dict({"message_key": {"type": "integer"}}, **ANALYSIS_PROPERTIES)
+
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analyses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": BATCH_ITEM_PROPERTIES,
+                "required": list(BATCH_ITEM_PROPERTIES),
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["analyses"],
+    "additionalProperties": False,
+}
+
+
+class ModelRouter:
+    """메시지 분석 모델 단계별 선택
+
+    짧은 메시지는 빠르고 저렴한 모델(fast)로 먼저 보내고, 확신도가 낮거나
+    결과가 애매하면(날짜 없는 일정 등) 큰 모델(large)로 다시 요청합니다.
+    모든 요청은 JSON 스키마 구조화된 출력 모드를 사용하므로 응답을 바로
+    json.loads로 읽을 수 있습니다. 단계별 요청 수, 지연 시간, 상향 비율을 기록합니다.
+    """
+
+    def __init__(self, large_model, fast_model=None, fast_max_tokens=400,
+                 escalate_below=0.7, count_tokens=None, system_prompt='', temperature=0.1):
+        self.tiers = [('large', large_model)]
+        if fast_model and fast_model != large_model:
+            self.tiers.insert(0, ('fast', fast_model))
+        self.fast_max_tokens = fast_max_tokens
+        self.escalate_below = escalate_below
+        self.count_tokens = count_tokens or (lambda text: len(text) // 2)
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self._metrics = {name: {'requests': 0, 'messages': 0, 'errors': 0, 'escalations': 0,
+                                'latencies': []}
+                         for name, _ in self.tiers}
+        self._lock = threading.Lock()
+
+    def choose_tier(self, texts):
+        """메시지 내용(여러 개면 모두)이 짧으면 첫 단계, 아니면 마지막 단계"""
+        if isinstance(texts, str):
+            texts = [texts]
+        if all(self.count_tokens(text or '') <= self.fast_max_tokens for text in texts):
+            return 0
+        return len(self.tiers) - 1
+
+    def build_request(self, prompt, tier, batch=False):
+        """chat.completions.create에 넘길 인자 생성"""
+        return {
+            "model": self.tiers[tier][1],
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": self.temperature,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "message_analyses" if batch else "message_analysis",
+                    "strict": True,
+                    "schema": BATCH_SCHEMA if batch else ANALYSIS_SCHEMA,
+                },
+            },
+        }
+
+    @staticmethod
+    def response_text(response):
+        """응답 본문 (모델이 거부했으면 예외)"""
+        message = response.choices[0].message
+        refusal = getattr(message, 'refusal', None)
+        if refusal:
+            raise ValueError(f"모델이 응답을 거부함: {refusal}")
+        return message.content.strip()
+
+    def is_ambiguous(self, analysis):
+        """더 큰 모델로 다시 확인할 만큼 애매한 결과인지"""
+        confidence = analysis.pop('confidence', None)
+        if confidence is not None and confidence < self.escalate_below:
+            return True
+        if analysis.get('type') not in ('calendar', 'todo', 'info'):
+            return True
+        # 일정인데 날짜가 없으면 분류가 틀렸을 가능성이 큼
+        return analysis['type'] == 'calendar' and not (analysis.get('date') or analysis.get('deadline'))
+
+    def record(self, tier, latency, error=False, escalated=0, messages=1):
+        """단계별 요청 결과 기록 (escalated: 다음 단계로 보낸 메시지 수)"""
+        with self._lock:
+            metrics = self._metrics[self.tiers[tier][0]]
+            metrics['requests'] += 1
+            metrics['messages'] += messages
+            metrics['errors'] += error
+            metrics['escalations'] += escalated
+            metrics['latencies'].append(latency)
+            del metrics['latencies'][:-1000]
+
+    def _finish(self, tier, started, analysis, error):
+        """요청 하나를 기록하고 (결과, 다음 단계 또는 None) 반환"""
+        can_escalate = tier + 1 < len(self.tiers)
+        ambiguous = analysis is not None and self.is_ambiguous(analysis)
+        escalate = can_escalate and (error is not None or ambiguous)
+        self.record(tier, time.monotonic() - started, error=error is not None, escalated=escalate)
+        if escalate:
+            reason = f"오류: {error}" if error is not None else "애매한 결과"
+            logger.info(f"⬆️ {self.tiers[tier][1]} → {self.tiers[tier + 1][1]} 다시 분석 ({reason})")
+            return None, tier + 1
+        if error is not None:
+            raise error
+        return analysis, None
+
+    def analysis_steps(self, prompt, text, parse, escalated=False, tokens=0):
+        """단계를 올려 가며 분석하는 흐름 (제너레이터)
+
+        요청할 때마다 (요청 인자, 예상 토큰 수)를 yield하고, 호출한 쪽이 보낸
+        응답(또는 throw한 예외)을 받아 parse(응답 본문)로 결과를 만듭니다. 스레드
+        엔진과 asyncio 엔진이 같은 흐름을 쓰고 요청 방법만 다르게 합니다.
+        escalated=True면 묶음 분석에서 애매했던 메시지이므로 마지막 단계부터 요청합니다.
+        """
+        tier = len(self.tiers) - 1 if escalated else self.choose_tier(text)
+        while True:
+            started = time.monotonic()
+            analysis, error = None, None
+            try:
+                response = yield self.build_request(prompt, tier), tokens
+                analysis = parse(self.response_text(response))
+            except Exception as e:
+                error = e
+            analysis, tier = self._finish(tier, started, analysis, error)
+            if tier is None:
+                return analysis
+
+    def split_batch(self, analyses, tier, started, messages):
+        """묶음 결과를 기록하고 애매한 항목을 빼서 ({키: 결과}, 더 큰 모델로 보낼 키 목록) 반환"""
+        ambiguous = [key for key, analysis in analyses.items() if self.is_ambiguous(analysis)]
+        escalate = ambiguous if tier + 1 < len(self.tiers) else []
+        for key in escalate:
+            del analyses[key]
+        self.record(tier, time.monotonic() - started, escalated=len(escalate), messages=messages)
+        return analyses, escalate
+
+    def stats(self):
+        """단계별 모델, 요청/메시지 수, 오류 수, 상향 비율(메시지 기준), 지연 시간(초)"""
+        result = {}
+        with self._lock:
+            for name, model in self.tiers:
+                metrics = self._metrics[name]
+                latencies = sorted(metrics['latencies'])
+                messages = metrics['messages']
+                result[name] = {
+                    'model': model,
+                    'requests': metrics['requests'],
+                    'messages': messages,
+                    'errors': metrics['errors'],
+                    'escalations': metrics['escalations'],
+                    'escalation_rate': metrics['escalations'] / messages if messages else 0.0,
+                    'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                    'latency_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+                    'latency_max': latencies[-1] if latencies else 0.0,
+                }
+        return result
@@ -0,0 +1,183 @@
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def run_steps(steps, perform):
+    """요청을 yield하는 처리 흐름(제너레이터)을 끝까지 실행하고 결과 반환
+
+    흐름이 yield한 요청마다 perform(요청)의 결과를 돌려보내고, perform이 예외를
+    내면 흐름 안으로 던져 흐름이 처리하게 합니다. 스레드 엔진은 이 함수로,
+    asyncio 엔진은 AsyncEngine.run_steps로 같은 흐름을 실행합니다.
+    """
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = perform(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def estimate_tokens(text, completion_tokens=300):
+    """요청 토큰 수 대략 추정 (한글은 대략 2글자당 1토큰 + 응답 토큰)"""
+    return len(text) // 2 + completion_tokens
+
+
+class TokenBucket:
+    """분당 허용량 기준 토큰 버킷"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """토큰이 있으면 차감하고 0, 없으면 기다려야 할 초를 반환"""
+        # 한 번에 버킷 크기보다 많이 요청하면 영원히 기다리게 되므로 제한
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0
+            return (amount - self.tokens) / self.rate
+
+    def acquire(self, amount=1):
+        """amount만큼 토큰이 쌓일 때까지 기다린 뒤 차감"""
+        while True:
+            wait = self.reserve(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount=1):
+        """acquire의 asyncio 버전 (이벤트 루프를 막지 않음)"""
+        import asyncio
+        while True:
+            wait = self.reserve(amount)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """분당 요청 수(RPM)와 분당 토큰 수(TPM)를 함께 지키는 제한기"""
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=40000):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, estimated_tokens):
+        """요청 1건과 예상 토큰 수만큼 허용될 때까지 대기"""
+        self.requests.acquire(1)
+        self.tokens.acquire(estimated_tokens)
+
+    async def acquire_async(self, estimated_tokens):
+        """acquire의 asyncio 버전"""
+        await self.requests.acquire_async(1)
+        await self.tokens.acquire_async(estimated_tokens)
+
+
+class MessagePipeline:
+    """조회 → 분석(작업자 풀) → 전송 단계로 나눈 메시지 처리
+
+    분석은 여러 스레드에서 동시에 진행하지만, 전송과 체크포인트 갱신은
+    MessageKey 순서대로 호출한 스레드에서만 실행합니다. batch_size개씩 묶어
+    한 작업으로 분석하며, 동시에 진행 중인 항목 수를 제한해 메모리 사용량을
+    일정하게 유지합니다. 분석이 끝난 항목은 최대 dispatch_batch_size개까지
+    모아 한 번에 전송합니다. executor를 넘기면 여러 메일함이 작업자 풀 하나를
+    함께 사용합니다.
+    """
+
+    def __init__(self, processor, workers=4, batch_size=1, dispatch_batch_size=1, executor=None):
+        self.processor = processor
+        self.workers = workers
+        self.executor = executor
+        self.batch_size = max(1, batch_size)
+        self.dispatch_batch_size = max(1, dispatch_batch_size)
+        self.max_in_flight = workers * 2 * self.batch_size
+
+    def run(self, messages):
+        """메시지들을 처리하고 처리한 개수 반환"""
+        processed = 0
+        in_flight = deque()
+        ready = []
+        group = []
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers,
+                                                       thread_name_prefix='analysis')
+        try:
+            for message in messages:
+                item = self.processor.prepare_message(message)
+                if item is None:
+                    continue
+                group.append(item)
+                if len(group) < self.batch_size:
+                    continue
+                self._submit(executor, group, in_flight)
+                group = []
+
+                # 앞쪽부터 완료된 것만 순서대로 모았다가 dispatch_batch_size개가 되면 전송
+                while in_flight and (in_flight[0][1].done() or len(in_flight) >= self.max_in_flight):
+                    processed += self._collect_next(in_flight, ready)
+
+            if group:
+                self._submit(executor, group, in_flight)
+            while in_flight:
+                processed += self._collect_next(in_flight, ready)
+            processed += self._flush(ready)
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+        return processed
+
+    def _submit(self, executor, group, in_flight):
+        future = executor.submit(self.processor.analyze_items, group)
+        for item in group:
+            in_flight.append((item, future))
+        self.processor.metrics.set_gauge('analysis', len(in_flight))
+
+    def _collect_next(self, in_flight, ready):
+        """맨 앞 항목의 분석 결과를 전송 대기 목록에 추가 (가득 차면 전송)"""
+        processed = 0
+        if not in_flight[0][1].done():
+            # 앞 항목 분석을 기다리는 동안 모아 둔 항목이 머물지 않도록 먼저 전송
+            processed += self._flush(ready)
+        item, future = in_flight.popleft()
+        self.processor.metrics.set_gauge('analysis', len(in_flight))
+        try:
+            analysis = future.result().get(item['message_key'])
+        except Exception as e:
+            logger.error(f"❌ 메시지 분석 중 오류: {e}")
+            analysis = None
+        ready.append((item, analysis))
+        self.processor.metrics.set_gauge('dispatch', len(ready))
+        if len(ready) >= self.dispatch_batch_size:
+            processed += self._flush(ready)
+        return processed
+
+    def _flush(self, ready):
+        """전송 대기 중인 항목을 한 번에 전송"""
+        if not ready:
+            return 0
+        count = len(ready)
+        with self.processor.metrics.timer('dispatch'):
+            self.processor.dispatch_items(list(ready))
+        ready.clear()
+        self.processor.metrics.set_gauge('dispatch', 0)
+        return count
@@ -0,0 +1,181 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePollPolicy:
+    """주기 확인 간격 조절
+
+    새 메시지가 들어오면 min_interval로 줄이고, 조용하면 확인할 때마다
+    backoff배씩 늘려 max_interval까지 늦춥니다. 파일이 바뀌었는데 파일 감지
+    알림이 오지 않았다면 감지가 변경을 놓치고 있는 것이므로, 다음 감지 알림이
+    올 때까지 min_interval로 자주 확인합니다.
+    """
+
+    def __init__(self, min_interval=15, max_interval=300, backoff=2.0):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.interval = self.min_interval
+        self.watcher_healthy = True
+        self.missed_changes = 0
+        self._watch_events = 0
+        self._last_signature = None
+        self._lock = threading.Lock()
+
+    def on_watch_event(self):
+        """파일 감지 알림을 받음"""
+        with self._lock:
+            self._watch_events += 1
+            if not self.watcher_healthy:
+                logger.info("👀 파일 감지가 다시 동작합니다")
+            self.watcher_healthy = True
+
+    def on_pass(self, found_new, signature=None):
+        """처리가 끝난 뒤 다음 확인까지 기다릴 초 계산
+
+        signature는 DB 파일 서명(UDBReader.file_signature)으로, 지난 처리 이후
+        바뀌었는지 확인하는 데 사용합니다.
+        """
+        with self._lock:
+            watched = self._watch_events > 0
+            self._watch_events = 0
+            file_changed = (signature is not None and self._last_signature is not None
+                            and signature != self._last_signature)
+            self._last_signature = signature
+            if file_changed and not watched:
+                self.missed_changes += 1
+                if self.watcher_healthy:
+                    logger.warning("⚠️ 파일 감지가 변경을 놓쳤습니다. 확인 간격을 줄입니다")
+                self.watcher_healthy = False
+
+            if found_new or not self.watcher_healthy:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+            logger.debug(f"다음 확인까지 {self.interval:.0f}초")
+            return self.interval
+
+
+class ProcessingScheduler:
+    """파일 감지/주기 확인/트레이 명령을 모아 한 번에 하나씩 처리하는 스케줄러
+
+    처리는 run()을 호출한 스레드 하나에서만 실행되므로 두 처리가 동시에
+    last_message_key를 바꾸는 일이 없습니다. 처리 중에 들어온 요청은 모두
+    합쳐서 끝난 뒤 한 번만 다시 처리하고, 마지막 요청 후 debounce초 동안
+    조용해질 때까지 기다렸다가 시작해 연속된 쓰기를 한 번에 처리합니다.
+    쓰기가 계속 이어져도 첫 요청 후 max_delay초가 지나면 바로 처리합니다.
+    주기 확인 간격은 AdaptivePollPolicy가 정합니다.
+    """
+
+    WAIT_SLICE = 1.0  # Ctrl+C가 바로 전달되도록 나눠서 대기
+
+    def __init__(self, process, policy=None, debounce=0.5, change_probe=None, name=None, max_delay=5.0):
+        self.process = process  # 처리한 메시지 수를 반환
+        self.prefix = f"[{name}] " if name else ''  # 여러 메일함을 처리할 때 로그 구분용
+        self.policy = policy or AdaptivePollPolicy()
+        self.debounce = debounce
+        self.max_delay = max(debounce, max_delay)
+        self.change_probe = change_probe  # 파일 변경 여부 확인용 서명 (없으면 확인 안 함)
+        self.passes = 0
+        self.coalesced = 0
+        self.latencies = []
+        self._cond = threading.Condition()
+        self._pending_since = None
+        self._last_request = 0.0
+        self._requests = 0
+        self._status = False
+        self._quit = False
+
+    def notify(self, command='process'):
+        """다른 스레드(watchdog, 트레이)에서 명령 전달 ('watch', 'process', 'status', 'quit')"""
+        if command == 'watch':
+            self.policy.on_watch_event()
+        with self._cond:
+            if command == 'quit':
+                self._quit = True
+            elif command == 'status':
+                self._status = True
+            else:
+                now = time.monotonic()
+                if self._pending_since is None:
+                    self._pending_since = now
+                self._last_request = now
+                self._requests += 1
+            self._cond.notify()
+
+    def run(self):
+        """'quit' 명령을 받을 때까지 요청을 처리 (처음 한 번은 바로 처리)"""
+        self.notify('process')
+        next_poll = time.monotonic() + self.policy.interval
+        while True:
+            with self._cond:
+                while not (self._quit or self._status or self._pending_since is not None):
+                    remaining = next_poll - time.monotonic()
+                    if remaining <= 0:
+                        # 파일 감지 실패 대비 주기적 확인
+                        self._pending_since = self._last_request = time.monotonic()
+                        self._requests += 1
+                        break
+                    self._cond.wait(min(remaining, self.WAIT_SLICE))
+
+                if self._quit:
+                    return
+                if self._status:
+                    self._status = False
+                    logger.info("CoolMessenger가 백그라운드에서 실행 중입니다.")
+                    stats = self.stats()
+                    logger.info(f"⏱️ 처리 {stats['passes']}회, 지연 중앙값 {stats['latency_p50']:.2f}초 "
+                                f"/ 최대 {stats['latency_max']:.2f}초")
+                    continue
+
+                # 마지막 요청 후 debounce초 동안 새 요청이 없을 때까지 대기
+                # (요청이 계속 들어와도 첫 요청 후 max_delay초를 넘기지 않음)
+                while not self._quit:
+                    start_at = min(self._last_request + self.debounce,
+                                   self._pending_since + self.max_delay)
+                    quiet = start_at - time.monotonic()
+                    if quiet <= 0:
+                        break
+                    self._cond.wait(min(quiet, self.WAIT_SLICE))
+                if self._quit:
+                    return
+
+                requested_at = self._pending_since
+                requests = self._requests
+                self._pending_since = None
+                self._requests = 0
+
+            processed = self._run_pass(requested_at, requests)
+            next_poll = time.monotonic() + self.policy.on_pass(
+                processed > 0, self.change_probe() if self.change_probe else None)
+
+    def _run_pass(self, requested_at, requests):
+        if requests > 1:
+            logger.info(f"📝 {self.prefix}변경 요청 {requests}건을 한 번에 처리합니다")
+        processed = 0
+        try:
+            processed = self.process() or 0
+        except Exception as e:
+            logger.error(f"❌ {self.prefix}메시지 처리 중 오류: {e}")
+        latency = time.monotonic() - requested_at
+        self.passes += 1
+        self.coalesced += requests - 1
+        self.latencies.append(latency)
+        # 최근 1000건만 보관
+        del self.latencies[:-1000]
+        logger.debug(f"⏱️ {self.prefix}변경 감지부터 처리 완료까지 {latency:.2f}초")
+        return processed
+
+    def stats(self):
+        """처리 횟수, 합쳐진 요청 수, 지연 시간(초) 통계"""
+        latencies = sorted(self.latencies)
+        return {
+            'passes': self.passes,
+            'coalesced': self.coalesced,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+            'latency_max': latencies[-1] if latencies else 0.0,
+        }
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CoolMessenger 시작 시간 점검 도구
+명령별 실행 시간을 여러 번 재서 가져오기(import) 시간 예산을 넘는지 확인
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# 점검할 명령과 예산 (파이썬 인터프리터 자체 시작 시간을 뺀 밀리초)
+# --help는 모듈을 모두 불러온 뒤 인자 처리에서 바로 끝나므로
+# --setup-startup / --remove-startup과 같은 경로의 시작 시간을 잽니다
+BUDGETS_MS = [
+    ('coolmessenger_auto.py --help', ['coolmessenger_auto.py', '--help'], 150),
+    ('log_viewer.py --help', ['log_viewer.py', '--help'], 50),
+]
+
+def measure(args, runs, cwd):
+    """명령을 runs번 실행해 걸린 시간(ms) 중앙값 반환 (명령이 실패하면 RuntimeError)"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, cwd=cwd,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+        # 가져오기 오류로 바로 끝난 명령은 빨라 보이므로 시간으로 인정하지 않음
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            raise RuntimeError(f"종료 코드 {result.returncode}"
+                               + (f": {error[-1]}" if error else ""))
+    return statistics.median(samples)
+
+def show_import_details(module, cwd, top=10):
+    """python -X importtime 결과에서 누적 시간이 큰 모듈 출력"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, capture_output=True, text=True, check=False)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        parts = line.split('|')
+        rows.append((int(parts[1]), parts[2].rstrip()))
+    print(f"\n🔍 {module} 가져오기 시간 상위 {top}개 (누적)")
+    for cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description='CoolMessenger 시작 시간 점검')
+    parser.add_argument('--runs', '-n', type=int, default=5,
+                       help='명령별 실행 횟수 (기본값: 5)')
+    parser.add_argument('--details', action='store_true',
+                       help='coolmessenger_auto 가져오기 시간 상세 출력')
+
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline = measure(['-c', 'pass'], args.runs, cwd)
+    print(f"🐍 파이썬 시작 시간: {baseline:.0f} ms")
+
+    over_budget = False
+    for label, command, budget in BUDGETS_MS:
+        try:
+            elapsed = measure(command, args.runs, cwd) - baseline
+        except RuntimeError as e:
+            over_budget = True
+            print(f"❌ {label}: 실행 실패 ({e})")
+            continue
+        ok = elapsed <= budget
+        over_budget = over_budget or not ok
+        print(f"{'✅' if ok else '❌'} {label}: {elapsed:.0f} ms (예산 {budget} ms)")
+
+    if args.details:
+        show_import_details('coolmessenger_auto', cwd)
+
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessingStateStore:
+    """메시지별 처리 상태와 체크포인트를 저장하는 내장 데이터베이스
+
+    상태 변경은 메모리에 모았다가 한 트랜잭션으로 기록합니다. SQLite 트랜잭션이므로
+    중간에 프로그램이 종료되어도 파일이 깨지지 않고, 마지막으로 커밋된 상태에서
+    다시 시작합니다. mark()는 스스로 커밋하지 않으므로 전송 단계가 묶음마다
+    flush()를 호출할 때 상태와 체크포인트가 함께 기록됩니다. 바로 기록해야 하는
+    상태는 commit=True로 즉시 기록합니다.
+    """
+
+    FETCHED = 'fetched'
+    ANALYSED = 'analysed'
+    DISPATCHED = 'dispatched'
+    FAILED = 'failed'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS message_state (
+        message_key INTEGER PRIMARY KEY,
+        status TEXT NOT NULL,
+        analysis TEXT,
+        error TEXT,
+        updated_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, path='processing_state.db'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._pending_checkpoint = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+
+    def get_checkpoint(self):
+        """마지막으로 처리 완료한 메시지 키 (없으면 None)"""
+        with self._lock:
+            if self._pending_checkpoint is not None:
+                return self._pending_checkpoint
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'checkpoint'").fetchone()
+            return int(row[0]) if row else None
+
+    def set_checkpoint(self, message_key):
+        """체크포인트 변경 (다음 커밋 때 함께 기록)"""
+        with self._lock:
+            self._pending_checkpoint = message_key
+
+    def import_legacy_checkpoint(self, legacy_path='last_processed.txt'):
+        """예전 last_processed.txt 값을 체크포인트로 가져오기"""
+        if not os.path.exists(legacy_path):
+            return None
+        try:
+            with open(legacy_path, 'r') as f:
+                message_key = int(f.read().strip())
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ {legacy_path} 파일을 읽을 수 없어 무시합니다: {e}")
+            return None
+        with self._lock:
+            self.set_checkpoint(message_key)
+            self.flush()
+        logger.info(f"📦 {legacy_path}의 체크포인트({message_key})를 상태 저장소로 옮겼습니다")
+        return message_key
+
+    def get_state(self, message_key):
+        """메시지 상태와 저장된 분석 결과 반환 (없으면 (None, None))"""
+        with self._lock:
+            if message_key in self._pending:
+                status, analysis, _ = self._pending[message_key]
+                return status, analysis
+            row = self._conn.execute(
+                "SELECT status, analysis FROM message_state WHERE message_key = ?",
+                (message_key,)).fetchone()
+        if not row:
+            return None, None
+        status, analysis = row
+        return status, json.loads(analysis) if analysis else None
+
+    def mark(self, message_key, status, analysis=None, error=None, commit=False):
+        """메시지 상태 기록 (commit=True면 바로 커밋, 아니면 다음 flush() 때 기록)"""
+        with self._lock:
+            if analysis is None and message_key in self._pending:
+                analysis = self._pending[message_key][1]
+            self._pending[message_key] = (status, analysis, error)
+            if commit:
+                self.flush()
+
+    def flush(self):
+        """모아 둔 상태 변경을 한 트랜잭션으로 기록"""
+        with self._lock:
+            if not self._pending and self._pending_checkpoint is None:
+                return
+            now = datetime.now().isoformat(timespec='seconds')
+            rows = [
+                (key, status,
+                 json.dumps(analysis, ensure_ascii=False) if analysis is not None else None,
+                 error, now)
+                for key, (status, analysis, error) in self._pending.items()
+            ]
+            with self._conn:
+                # 분석 결과가 없는 상태 변경은 기존 분석 결과를 유지
+                self._conn.executemany("""
+                    INSERT INTO message_state (message_key, status, analysis, error, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(message_key) DO UPDATE SET
+                        status = excluded.status,
+                        analysis = COALESCE(excluded.analysis, message_state.analysis),
+                        error = excluded.error,
+                        updated_at = excluded.updated_at
+                """, rows)
+                if self._pending_checkpoint is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (name, value) VALUES ('checkpoint', ?)",
+                        (str(self._pending_checkpoint),))
+            self._pending.clear()
+            self._pending_checkpoint = None
+
+    def close(self):
+        """남은 변경을 기록하고 연결 닫기"""
+        with self._lock:
+            self.flush()
+            self._conn.close()
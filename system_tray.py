@@ -7,8 +7,9 @@ import os
 class SystemTrayApp:
     """시스템 트레이 앱"""
     
-    def __init__(self, processor):
+    def __init__(self, processor, on_command=None):
         self.processor = processor
+        self.on_command = on_command  # 실행 엔진(스케줄러/이벤트 루프)으로 명령 전달
         self.running = True
         self.icon = None
         
@@ -27,16 +28,30 @@ class SystemTrayApp:
         """앱 종료"""
         self.running = False
         icon.stop()
+        if self.on_command:
+            self.on_command('quit')
+            return
         sys.exit(0)
     
     def show_status(self, icon, item):
         """상태 표시"""
+        if self.on_command:
+            self.on_command('status')
+            return
         print("CoolMessenger가 백그라운드에서 실행 중입니다.")
     
+    def check_now(self, icon, item):
+        """새 메시지 바로 확인"""
+        if self.on_command:
+            self.on_command('process')
+        else:
+            self.processor.process_new_messages()
+    
     def run_tray(self):
         """시스템 트레이 실행"""
         menu = pystray.Menu(
             pystray.MenuItem("상태 확인", self.show_status),
+            pystray.MenuItem("지금 확인", self.check_now),
             pystray.MenuItem("종료", self.quit_app)
         )
         
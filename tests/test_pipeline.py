@@ -0,0 +1,89 @@
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from pipeline import MessagePipeline
+
+
+class FakeMetrics:
+    def set_gauge(self, name, value):
+        pass
+
+    @contextmanager
+    def timer(self, stage):
+        yield
+
+
+class FakeProcessor:
+    """분석은 바로 끝나고 전송 호출만 기록하는 가짜 프로세서"""
+
+    def __init__(self, analyze_delay=None):
+        self.metrics = FakeMetrics()
+        self.dispatches = []
+        self.analyze_delay = analyze_delay
+
+    def prepare_message(self, message):
+        return {'message_key': message}
+
+    def analyze_items(self, items):
+        if self.analyze_delay is not None:
+            self.analyze_delay.wait(1)
+        return {item['message_key']: {'type': 'info'} for item in items}
+
+    def dispatch_items(self, pairs):
+        self.dispatches.append([item['message_key'] for item, _ in pairs])
+
+
+class ImmediateExecutor:
+    """submit 즉시 실행하는 실행기 (결과가 항상 완료된 상태)"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class MessagePipelineDispatchBatchTest(unittest.TestCase):
+    def test_backlog_is_dispatched_in_full_batches(self):
+        processor = FakeProcessor()
+        pipeline = MessagePipeline(processor, workers=4, dispatch_batch_size=10,
+                                   executor=ImmediateExecutor())
+
+        processed = pipeline.run(range(1, 101))
+
+        self.assertEqual(processed, 100)
+        self.assertEqual(len(processor.dispatches), 10)
+        self.assertEqual([key for batch in processor.dispatches for key in batch], list(range(1, 101)))
+
+    def test_backlog_with_worker_pool_keeps_batches(self):
+        processor = FakeProcessor()
+        pipeline = MessagePipeline(processor, workers=4, dispatch_batch_size=10)
+
+        processed = pipeline.run(range(1, 201))
+
+        self.assertEqual(processed, 200)
+        self.assertEqual([key for batch in processor.dispatches for key in batch], list(range(1, 201)))
+        # 분석이 늦은 항목을 기다리기 전에 먼저 보내는 경우만 10개보다 작을 수 있음
+        self.assertLessEqual(len(processor.dispatches), 200 // 10 * 2)
+
+    def test_ready_items_are_sent_while_waiting_for_slow_analysis(self):
+        release = threading.Event()
+        processor = FakeProcessor(analyze_delay=release)
+        executor = ThreadPoolExecutor(max_workers=1)
+        pipeline = MessagePipeline(processor, workers=1, dispatch_batch_size=10, executor=executor)
+
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        try:
+            processed = pipeline.run(range(1, 6))
+        finally:
+            timer.cancel()
+            executor.shutdown(wait=True)
+
+        self.assertEqual(processed, 5)
+        self.assertEqual([key for batch in processor.dispatches for key in batch], [1, 2, 3, 4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import re
+import html
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# HTML/서식
+MARKUP_HINT = re.compile(r'<\s*/?\s*[a-zA-Z!][^>]*>')
+SCRIPT_STYLE = re.compile(r'<\s*(script|style)[^>]*>.*?<\s*/\s*\1\s*>', re.IGNORECASE | re.DOTALL)
+BLOCK_TAGS = re.compile(r'<\s*(br|/p|/div|/li|/tr|/h\d)\s*/?\s*>', re.IGNORECASE)
+TAGS = re.compile(r'<[^>]+>')
+
+# 전달/회신으로 붙은 이전 메시지 구분선과 머리글(보낸 사람, 날짜 등)
+HISTORY_SEPARATOR = re.compile(
+    r'^\s*(-{2,}\s*(original message|forwarded message|원본 메시지|전달된 메시지|전달 메시지)\s*-{2,}'
+    r'|={3,}\s*(원본|전달)[^=]*={3,})\s*$',
+    re.IGNORECASE)
+HISTORY_HEADER = re.compile(
+    r'^\s*(보낸\s*사람|받는\s*사람|보낸\s*날짜|참조|제목|From|To|Cc|Sent|Date|Subject)\s*:', re.IGNORECASE)
+REPLY_START = re.compile(r'^\s*(보낸\s*사람|From)\s*:', re.IGNORECASE)
+QUOTED_LINE = re.compile(r'^\s*>')
+SIGNATURE_MARKER = re.compile(r'^\s*--\s*$')
+MANY_SPACES = re.compile(r'[ \t ]+')
+
+TRUNCATED_NOTE = "\n…(이하 생략)"
+
+
+def strip_markup(text):
+    """HTML 태그를 없애고 줄바꿈만 남김"""
+    if not MARKUP_HINT.search(text):
+        return text
+    text = SCRIPT_STYLE.sub('', text)
+    text = BLOCK_TAGS.sub('\n', text)
+    text = TAGS.sub('', text)
+    return html.unescape(text)
+
+
+def collapse_history(text):
+    """전달/회신으로 이어 붙은 이전 메시지를 접기
+
+    첫 구분선 앞의 본문만 남기되, 본문 없이 전달만 한 메시지는 첫 번째
+    이전 메시지까지 남깁니다. 인용 줄(>)과 서명(-- 아래)은 지웁니다.
+    """
+    segments = [[]]
+    in_header = False
+    for line in text.splitlines():
+        if HISTORY_SEPARATOR.match(line):
+            segments.append([])
+            in_header = True
+        elif in_header and HISTORY_HEADER.match(line):
+            continue
+        elif REPLY_START.match(line) and ''.join(filter(None, segments[-1])).strip():
+            # 구분선 없이 본문 뒤에 "보낸 사람:"으로 시작하는 회신도 이전 메시지로 봄
+            segments.append([])
+            in_header = True
+        elif SIGNATURE_MARKER.match(line):
+            segments[-1].append(None)  # 서명 시작 표시
+            in_header = False
+        else:
+            if line.strip():
+                in_header = False
+            segments[-1].append(line)
+
+    def body(lines):
+        kept = []
+        for line in lines:
+            if line is None:
+                break
+            if not QUOTED_LINE.match(line):
+                kept.append(line)
+        return kept
+
+    kept = body(segments[0])
+    if not ''.join(kept).strip() and len(segments) > 1:
+        kept = body(segments[1])
+        dropped = len(segments) - 2
+    else:
+        dropped = len(segments) - 1
+    if dropped > 0:
+        kept.append(f"(이전 메시지 {dropped}개 생략)")
+    return '\n'.join(kept)
+
+
+def remove_repeats(text):
+    """공백 정리 + 이미 나온 줄(반복된 참조/수신자 목록 등)과 연속 빈 줄 제거"""
+    seen = set()
+    lines = []
+    for line in text.splitlines():
+        line = MANY_SPACES.sub(' ', line).strip()
+        if not line:
+            if lines and lines[-1]:
+                lines.append('')
+            continue
+        if line in seen:
+            continue
+        seen.add(line)
+        lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+def clean_text(text):
+    """서식, 이전 메시지, 반복되는 줄을 지운 분석용 텍스트"""
+    if not text:
+        return ''
+    text = str(text).replace('\r\n', '\n').replace('\r', '\n')
+    return remove_repeats(collapse_history(strip_markup(text)))
+
+
+class Tokenizer:
+    """모델 토크나이저 (tiktoken이 없거나 불러올 수 없으면 글자 수로 추정)"""
+
+    def __init__(self, model):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                try:
+                    import tiktoken
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model)
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding('cl100k_base')
+                except Exception as e:
+                    # 설치되지 않았거나 인코딩 파일을 받을 수 없는 경우
+                    logger.warning(f"⚠️ tiktoken을 사용할 수 없어 토큰 수를 글자 수로 추정합니다: {e}")
+            return self._encoding
+
+    def count(self, text):
+        """토큰 수"""
+        encoding = self.encoding
+        if encoding is None:
+            return len(text) // 2  # 한글은 대략 2글자당 1토큰
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text, max_tokens):
+        """앞에서부터 max_tokens 토큰까지만 남기기"""
+        encoding = self.encoding
+        if encoding is None:
+            return text[:max_tokens * 2]
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens])
+
+
+class MessageNormalizer:
+    """AI에 보내기 전 메시지 정리
+
+    서식과 전달/회신 이력, 반복되는 줄을 지운 뒤 max_tokens 토큰으로 자릅니다.
+    정리한 텍스트는 MessageKey별로 보관해 묶음 분석이 실패해 다시 분석할 때
+    다시 계산하지 않으며, 줄어든 토큰 수를 모아 둡니다.
+    """
+
+    def __init__(self, model, max_tokens=1500, cache_entries=1024, enabled=True):
+        self.tokenizer = Tokenizer(model)
+        self.max_tokens = max_tokens
+        self.cache_entries = cache_entries
+        self.enabled = enabled
+        self.messages = 0
+        self.truncated = 0
+        self.original_tokens = 0
+        self.cleaned_tokens = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def normalize(self, message_key, text):
+        """분석용으로 정리한 텍스트 (MessageKey별로 한 번만 계산)"""
+        if not self.enabled or not text:
+            return text
+        with self._lock:
+            cached = self._cache.get(message_key)
+            if cached is not None:
+                self._cache.move_to_end(message_key)
+                return cached
+
+        cleaned = clean_text(text) or text
+        original_tokens = self.tokenizer.count(text)
+        cleaned_tokens = self.tokenizer.count(cleaned)
+        truncated = cleaned_tokens > self.max_tokens
+        if truncated:
+            cleaned = self.tokenizer.truncate(cleaned, self.max_tokens) + TRUNCATED_NOTE
+            cleaned_tokens = self.tokenizer.count(cleaned)
+        if original_tokens > cleaned_tokens:
+            logger.debug(f"✂️ 메시지 {message_key} 정리: {original_tokens} → {cleaned_tokens} 토큰")
+
+        with self._lock:
+            self.messages += 1
+            self.truncated += truncated
+            self.original_tokens += original_tokens
+            self.cleaned_tokens += cleaned_tokens
+            self._cache[message_key] = cleaned
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return cleaned
+
+    def stats(self):
+        """정리한 메시지 수와 줄어든 토큰 수"""
+        return {
+            'messages': self.messages,
+            'truncated': self.truncated,
+            'original_tokens': self.original_tokens,
+            'cleaned_tokens': self.cleaned_tokens,
+            'tokens_saved': self.original_tokens - self.cleaned_tokens,
+        }
@@ -0,0 +1,196 @@
+import os
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class UDBReader:
+    """쿨메신저 .udb 파일 읽기 전용 연결 관리
+
+    연결을 한 번 열어 계속 재사용합니다. sqlite3 모듈은 연결마다 SQL 문자열
+    기준으로 준비된 문(prepared statement)을 캐시하므로, 아래 상수 쿼리들은
+    처음 한 번만 파싱됩니다. 파일이 교체되거나 잠겨서 오류가 나면 다시 연결합니다.
+    watchdog 스레드와 메인 루프가 함께 사용할 수 있도록 잠금으로 보호합니다.
+    """
+
+    NEW_MESSAGES_QUERY = """
+    SELECT MessageKey, MessageBody, Title, Sender, SenderKey,
+           MessageType, ReceiveDate, MessageText, MemoID,
+           ReferenceList, CCList, FilePath, IsUnRead
+    FROM tbl_recv
+    WHERE MessageKey > ? AND DeletedDate IS NULL
+    ORDER BY MessageKey ASC
+    LIMIT ?
+    """
+
+    RANGE_MESSAGES_QUERY = """
+    SELECT MessageKey, MessageBody, Title, Sender, SenderKey,
+           MessageType, ReceiveDate, MessageText, MemoID,
+           ReferenceList, CCList, FilePath, IsUnRead
+    FROM tbl_recv
+    WHERE MessageKey > ? AND MessageKey <= ? AND DeletedDate IS NULL
+    ORDER BY MessageKey ASC
+    LIMIT ?
+    """
+
+    COUNT_RANGE_QUERY = """
+    SELECT COUNT(*)
+    FROM tbl_recv
+    WHERE MessageKey > ? AND MessageKey <= ? AND DeletedDate IS NULL
+    """
+
+    KEY_DATES_QUERY = """
+    SELECT MessageKey, ReceiveDate
+    FROM tbl_recv
+    WHERE MessageKey > ?
+    ORDER BY MessageKey ASC
+    LIMIT ?
+    """
+
+    MAX_KEY_QUERY = "SELECT MAX(MessageKey) FROM tbl_recv"
+
+    # 삭제된 행은 조회하지 않으므로 새 메시지 확인에서도 제외
+    # (MAX()에 조건을 붙이면 전체를 훑으므로 키 역순으로 처음 만나는 행만 읽음)
+    LIVE_MAX_KEY_QUERY = """
+    SELECT MessageKey
+    FROM tbl_recv
+    WHERE DeletedDate IS NULL
+    ORDER BY MessageKey DESC
+    LIMIT 1
+    """
+
+    DATA_VERSION_QUERY = "PRAGMA data_version"
+
+    def __init__(self, db_path, timeout=5.0, cached_statements=32, batch_size=50):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._lock = threading.RLock()
+        self._conn = None
+        self._file_id = None
+        self._change_signature = None
+        self._known_max_key = None
+
+    def _current_file_id(self):
+        """파일 교체 여부 확인용 식별자 (장치, inode)"""
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+    def _connect(self):
+        """읽기 전용(mode=ro) URI로 새 연결 생성"""
+        uri = Path(os.path.abspath(self.db_path)).as_uri() + '?mode=ro'
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        self._file_id = self._current_file_id()
+        logger.debug(f"UDB 읽기 전용 연결 생성: {self.db_path}")
+        return conn
+
+    def _get_connection(self):
+        """기존 연결 반환 (파일이 교체되었으면 다시 연결)"""
+        if self._conn is not None and self._current_file_id() != self._file_id:
+            logger.info("🔄 데이터베이스 파일 교체 감지 - 다시 연결합니다")
+            self.close()
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def execute(self, query, params=()):
+        """쿼리 실행 후 전체 결과 반환 (잠김/교체 시 한 번 재연결 후 재시도)"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    conn = self._get_connection()
+                    return conn.execute(query, params).fetchall()
+                except sqlite3.OperationalError as e:
+                    if attempt:
+                        raise
+                    logger.warning(f"⚠️ 데이터베이스 접근 실패, 다시 연결합니다: {e}")
+                    self.close()
+
+    def iter_new_messages(self, after_key, batch_size=None, until_key=None):
+        """after_key 이후(until_key를 주면 그 키까지)의 삭제되지 않은 메시지를 batch_size개씩 나누어 반환
+
+        묶음마다 마지막 키 이후부터 다시 조회(keyset 방식)하므로 메모리에는
+        한 묶음만 올라가고, 묶음 사이에는 잠금을 풀어 다른 스레드가 사용할 수 있습니다.
+        """
+        batch_size = batch_size or self.batch_size
+        while True:
+            if until_key is None:
+                rows = self.execute(self.NEW_MESSAGES_QUERY, (after_key, batch_size))
+            else:
+                rows = self.execute(self.RANGE_MESSAGES_QUERY, (after_key, until_key, batch_size))
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_key = rows[-1][0]
+
+    def iter_key_dates(self, after_key, batch_size=1000):
+        """after_key 이후 메시지의 (MessageKey, ReceiveDate)를 묶음 단위로 반환"""
+        while True:
+            rows = self.execute(self.KEY_DATES_QUERY, (after_key, batch_size))
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_key = rows[-1][0]
+
+    def count_messages(self, after_key, until_key):
+        """after_key 초과 until_key 이하의 삭제되지 않은 메시지 수"""
+        return self.execute(self.COUNT_RANGE_QUERY, (after_key, until_key))[0][0]
+
+    def fetch_max_key(self):
+        """가장 큰 메시지 키 조회"""
+        return self.execute(self.MAX_KEY_QUERY)[0][0]
+
+    def file_signature(self):
+        """본 파일과 -wal 파일의 (수정 시각, 크기)"""
+        signature = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def has_new_messages(self, last_key):
+        """전체 조회 없이 새 메시지가 있을 수 있는지 빠르게 확인
+
+        파일 시각/크기와 PRAGMA data_version이 그대로면 마지막으로 확인한
+        최대 키를 그대로 사용하고, 바뀐 경우에만 삭제되지 않은 행의 최대 키를
+        다시 조회합니다. 읽음 표시처럼 행이 추가되지 않는 변경은 여기서 걸러집니다.
+        """
+        with self._lock:
+            data_version = self.execute(self.DATA_VERSION_QUERY)[0][0]
+            signature = (self._file_id, self.file_signature(), data_version)
+            if signature != self._change_signature or self._known_max_key is None:
+                rows = self.execute(self.LIVE_MAX_KEY_QUERY)
+                self._known_max_key = rows[0][0] if rows else 0
+                self._change_signature = signature
+            return self._known_max_key > last_key
+
+    def close(self):
+        """연결 닫기"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    pass
+                self._conn = None
+                self._file_id = None